@@ -1,45 +1,419 @@
 import redis
 import json
-from typing import Optional, Any
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Optional, Any, Callable, Dict, Iterator, List
 from app.config import get_settings
+from app.core.lru_cache import LRUCache
+from app.core.serializers import Serializer
+import math
+import os
+import random
+import threading
+import time
+import uuid
 import logging
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+INVALIDATION_CHANNEL = "cache:invalidate"
+TAG_PREFIX = "tag:"
+COMPUTED_PREFIX = "computed:"
+
+# Raises a key's TTL to ARGV[1] unless it already lives longer. Same effect as
+# EXPIRE NX followed by EXPIRE GT, which need Redis 7; this works on any version
+EXTEND_TTL_SCRIPT = """
+local ttl = redis.call('TTL', KEYS[1])
+if ttl < tonumber(ARGV[1]) then
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+end
+"""
+
+# Deletes every key tracked by the given tag sets, then the sets themselves.
+# The tracked keys are not declared in KEYS, so this is not Redis Cluster safe:
+# on a cluster the tagged keys would have to be deleted client-side instead
+INVALIDATE_TAGS_SCRIPT = """
+local deleted = 0
+for _, tag in ipairs(KEYS) do
+    local members = redis.call('SMEMBERS', tag)
+    for i = 1, #members, 500 do
+        deleted = deleted + redis.call('DEL', unpack(members, i, math.min(i + 499, #members)))
+    end
+    redis.call('DEL', tag)
+end
+return deleted
+"""
+
 class RedisCache:
-    def __init__(self):
+    def __init__(self, local_size: int = None, local_ttl: float = None):
         self.client = redis.from_url(settings.REDIS_URL, decode_responses=True)
+        # Cached payloads are tagged binary (see app.core.serializers), so they use a raw client
+        self.binary_client = redis.from_url(settings.REDIS_URL)
+        self.serializer = Serializer(
+            settings.CACHE_SERIALIZER, settings.CACHE_COMPRESSION, settings.CACHE_COMPRESS_MIN_BYTES
+        )
+        self.redis_hits = 0
+        self.redis_misses = 0
+        
+        # Optional in-process tier; values are shared objects, so callers must not mutate them
+        local_size = settings.CACHE_LOCAL_SIZE if local_size is None else local_size
+        local_ttl = settings.CACHE_LOCAL_TTL_SECONDS if local_ttl is None else local_ttl
+        self.local = LRUCache(maxsize=local_size, ttl=local_ttl) if local_size > 0 else None
+        self._instance_id = uuid.uuid4().hex
+        self._listener_pid = None
+        self._listener_lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_lock = threading.Lock()
     
     def get(self, key: str) -> Optional[Any]:
+        if self.local is not None:
+            self._ensure_listener()
+            value = self.local.get(key)
+            if value is not None:
+                return value
+        
         try:
-            value = self.client.get(key)
+            value = self.binary_client.get(key)
             if value:
-                return json.loads(value)
+                self.redis_hits += 1
+                value = Serializer.loads(value)
+                if self.local is not None:
+                    self.local.set(key, value)
+                return value
+            self.redis_misses += 1
         except Exception as e:
             logger.error(f"Cache get error: {e}")
         return None
     
-    def set(self, key: str, value: Any, ttl: int = None):
+    @contextmanager
+    def pipeline(self) -> Iterator[redis.client.Pipeline]:
+        """Queue commands and send them in one round trip when the block exits.
+        
+        The batch is flushed even if the block raises, because what callers queue here
+        (invalidations, lock releases, alerts) describes work that already happened.
+        Cache methods accept `pipe=` to join a caller's batch instead of sending their own.
+        """
+        pipe = self.binary_client.pipeline(transaction=False)
+        try:
+            yield pipe
+        finally:
+            try:
+                pipe.execute()
+            except Exception as e:
+                logger.error(f"Cache pipeline error: {e}")
+    
+    @contextmanager
+    def _batch(self, pipe: Optional[redis.client.Pipeline]) -> Iterator[redis.client.Pipeline]:
+        if pipe is not None:
+            yield pipe
+            return
+        with self.pipeline() as own:
+            yield own
+    
+    @staticmethod
+    def default_tags(key: str) -> List[str]:
+        """Keys are tagged with their namespace, e.g. user:42:accounts -> user:42"""
+        parts = key.split(":")
+        return [":".join(parts[:2])] if len(parts) > 2 else []
+    
+    def set(
+        self,
+        key: str,
+        value: Any,
+        ttl: int = None,
+        tags: Optional[List[str]] = None,
+        pipe=None,
+        overwrite: bool = True
+    ):
+        """Store a value and register it under its tags (key prefixes) for invalidate_tags"""
+        self.mset({key: value}, ttl=ttl, tags=tags, pipe=pipe, overwrite=overwrite)
+    
+    def mset(
+        self,
+        mapping: Dict[str, Any],
+        ttl: int = None,
+        tags: Optional[List[str]] = None,
+        pipe=None,
+        overwrite: bool = True
+    ):
+        """Store several values, and register them under their tags, in one round trip.
+        
+        Pass overwrite=False when filling keys that were just missing: no other worker can
+        hold a copy worth dropping, so the invalidation broadcast is skipped.
+        """
+        if not mapping:
+            return
         try:
             ttl = ttl or settings.CACHE_TTL
-            self.client.setex(key, ttl, json.dumps(value))
+            payloads = {key: self.serializer.dumps(value) for key, value in mapping.items()}
+            keys_by_tag: Dict[str, List[str]] = {}
+            for key in mapping:
+                for tag in (RedisCache.default_tags(key) if tags is None else tags):
+                    keys_by_tag.setdefault(tag, []).append(key)
+            
+            with self._batch(pipe) as batch:
+                for key, payload in payloads.items():
+                    batch.setex(key, ttl, payload)
+                for tag, keys in keys_by_tag.items():
+                    # Tag sets must outlive every key they track: set a TTL once, then only extend it
+                    batch.sadd(f"{TAG_PREFIX}{tag}", *keys)
+                    batch.eval(EXTEND_TTL_SCRIPT, 1, f"{TAG_PREFIX}{tag}", ttl)
+                if self.local is not None and overwrite:
+                    batch.publish(INVALIDATION_CHANNEL, self._invalidation_message(keys=list(mapping)))
+            
+            if self.local is not None:
+                for key, value in mapping.items():
+                    self.local.set(key, value, ttl)
         except Exception as e:
             logger.error(f"Cache set error: {e}")
     
-    def delete(self, key: str):
+    def delete(self, key: str, pipe=None):
+        self.delete_many([key], pipe=pipe)
+    
+    def delete_many(self, keys: List[str], pipe=None):
+        """Delete several keys, and tell other workers, in one round trip"""
+        keys = list(keys)
+        if not keys:
+            return
+        if self.local is not None:
+            self._apply_invalidation(keys=keys)
+        with self._batch(pipe) as batch:
+            batch.delete(*keys)
+            if self.local is not None:
+                batch.publish(INVALIDATION_CHANNEL, self._invalidation_message(keys=keys))
+    
+    def incr(self, key: str) -> Optional[int]:
+        self._drop_local(keys=[key])
+        try:
+            return self.client.incr(key)
+        except Exception as e:
+            logger.error(f"Cache incr error: {e}")
+            return None
+    
+    def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Any],
+        ttl: int = None,
+        stale_ttl: int = None,
+        tags: Optional[List[str]] = None
+    ) -> Any:
+        """Read-through cache with single-flight, early refresh and stale-while-revalidate.
+        
+        Entries stay fresh for `ttl` seconds and may be served stale for `stale_ttl` more
+        while one caller recomputes. Close to expiry a caller may refresh early, with a
+        probability that grows as expiry nears and with how slow `compute` was (XFetch).
+        
+        The returned value may be the same object handed to concurrent callers and kept in
+        the local tier, so callers must not mutate it.
+        """
+        ttl = ttl or settings.CACHE_TTL
+        stale_ttl = settings.CACHE_STALE_TTL_SECONDS if stale_ttl is None else stale_ttl
+        
+        entry = self._get_entry(key)
+        if entry is not None:
+            now = time.time()
+            early = entry["delta"] * settings.CACHE_EARLY_REFRESH_BETA * -math.log(1.0 - random.random())
+            if now + early < entry["fresh_until"]:
+                return entry["value"]
+            # Stale or due for early refresh: one caller recomputes, everyone else gets the old value
+            locked = self._try_lock(f"compute:{key}")
+            if locked is False:
+                return entry["value"]
+            return self._compute_and_store(key, compute, ttl, stale_ttl, tags, release_lock=locked)
+        
+        return self._single_flight(key, lambda: self._compute_cold(key, compute, ttl, stale_ttl, tags))
+    
+    def _get_entry(self, key: str) -> Optional[dict]:
+        """Read a get_or_compute envelope; values stored by plain set() count as a miss"""
+        entry = self.get(key)
+        if isinstance(entry, dict) and {"value", "delta", "fresh_until"} <= entry.keys():
+            return entry
+        return None
+    
+    def _single_flight(self, key: str, fn: Callable[[], Any]) -> Any:
+        """Share one in-process computation per key between concurrent callers"""
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        
+        if not leader:
+            return future.result()
+        
+        try:
+            result = fn()
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+    
+    def _compute_cold(self, key: str, compute: Callable[[], Any], ttl: int, stale_ttl: int, tags):
+        locked = self._try_lock(f"compute:{key}")
+        if locked is False and self._wait_for_compute(key):
+            # Another process was computing and has stored its result
+            entry = self._get_entry(key)
+            if entry is not None:
+                return entry["value"]
+        # A cold miss fills a key nobody holds, so it needs no invalidation broadcast
+        return self._compute_and_store(
+            key, compute, ttl, stale_ttl, tags, release_lock=locked, overwrite=False
+        )
+    
+    def _compute_and_store(
+        self,
+        key: str,
+        compute: Callable[[], Any],
+        ttl: int,
+        stale_ttl: int,
+        tags,
+        release_lock: Optional[bool] = False,
+        overwrite: bool = True
+    ) -> Any:
+        # The write and the lock release go out together, so a refresh costs one round trip
+        with self.pipeline() as pipe:
+            try:
+                started = time.time()
+                value = compute()
+                finished = time.time()
+                self.set(key, {
+                    "value": value,
+                    "delta": finished - started,
+                    "fresh_until": finished + ttl
+                }, ttl=ttl + stale_ttl, tags=tags, pipe=pipe, overwrite=overwrite)
+                return value
+            finally:
+                if release_lock:
+                    self.release_lock(f"compute:{key}", pipe=pipe)
+                    # Wake processes blocked in _wait_for_compute; the signal is only useful
+                    # for as long as they wait
+                    pipe.rpush(f"{COMPUTED_PREFIX}{key}", 1)
+                    pipe.pexpire(f"{COMPUTED_PREFIX}{key}", settings.CACHE_COMPUTE_WAIT_MS)
+    
+    def _wait_for_compute(self, key: str) -> bool:
+        """Block until the lock holder signals completion, within CACHE_COMPUTE_WAIT_MS.
+        
+        Returns False on timeout, so a slow holder costs a waiter no more than the wait cap
+        before it computes the value itself.
+        """
+        signal = f"{COMPUTED_PREFIX}{key}"
         try:
-            self.client.delete(key)
+            if self.client.blpop([signal], timeout=settings.CACHE_COMPUTE_WAIT_MS / 1000) is None:
+                return False
         except Exception as e:
-            logger.error(f"Cache delete error: {e}")
+            logger.error(f"Cache compute wait error: {e}")
+            return False
+        
+        # Put the signal back for the next waiter, so one push wakes them all
+        with self.pipeline() as pipe:
+            pipe.rpush(signal, 1)
+            pipe.pexpire(signal, settings.CACHE_COMPUTE_WAIT_MS)
+        return True
+    
+    def _try_lock(self, lock_name: str) -> Optional[bool]:
+        """True if acquired, False if someone else holds it, None if Redis is unreachable"""
+        try:
+            return bool(self.client.set(
+                f"lock:{lock_name}", "1", nx=True, ex=settings.CACHE_COMPUTE_LOCK_SECONDS
+            ))
+        except Exception as e:
+            logger.error(f"Lock acquire error: {e}")
+            return None
+    
+    def invalidate_tags(self, *tags: str, pipe=None):
+        """Drop every key stored under any of the tags in a single round trip"""
+        if not tags:
+            return
+        if self.local is not None:
+            patterns = [f"{tag}:*" for tag in tags]
+            self._apply_invalidation(patterns=patterns)
+        with self._batch(pipe) as batch:
+            batch.eval(INVALIDATE_TAGS_SCRIPT, len(tags), *[f"{TAG_PREFIX}{tag}" for tag in tags])
+            if self.local is not None:
+                batch.publish(INVALIDATION_CHANNEL, self._invalidation_message(patterns=patterns))
     
     def invalidate_pattern(self, pattern: str):
+        """Ad-hoc SCAN-based invalidation; prefer invalidate_tags on hot paths"""
+        self._drop_local(patterns=[pattern])
         try:
             for key in self.client.scan_iter(match=pattern):
                 self.client.delete(key)
         except Exception as e:
             logger.error(f"Cache invalidate error: {e}")
     
+    def stats(self) -> dict:
+        total = self.redis_hits + self.redis_misses
+        return {
+            "local": self.local.stats() if self.local is not None else None,
+            "redis": {
+                "hits": self.redis_hits,
+                "misses": self.redis_misses,
+                "hit_rate": round(self.redis_hits / total, 4) if total else 0.0
+            }
+        }
+    
+    def _drop_local(self, keys: List[str] = (), patterns: List[str] = ()):
+        if self.local is None:
+            return
+        self._apply_invalidation(keys, patterns)
+        self._broadcast_invalidation(keys, patterns)
+    
+    def _apply_invalidation(self, keys: List[str] = (), patterns: List[str] = ()):
+        for key in keys:
+            self.local.delete(key)
+        for pattern in patterns:
+            self.local.delete_matching(pattern)
+    
+    def _invalidation_message(self, keys: List[str] = (), patterns: List[str] = ()) -> str:
+        return json.dumps({
+            "origin": self._instance_id,
+            "keys": list(keys),
+            "patterns": list(patterns)
+        })
+    
+    def _broadcast_invalidation(self, keys: List[str] = (), patterns: List[str] = ()):
+        try:
+            self.client.publish(INVALIDATION_CHANNEL, self._invalidation_message(keys, patterns))
+        except Exception as e:
+            logger.error(f"Cache invalidation publish error: {e}")
+    
+    def _handle_invalidation(self, message: dict):
+        data = json.loads(message["data"])
+        if data.get("origin") != self._instance_id:
+            self._apply_invalidation(data.get("keys", ()), data.get("patterns", ()))
+    
+    def _ensure_listener(self):
+        # Threads don't survive fork, so each worker process starts its own listener
+        if self._listener_pid == os.getpid():
+            return
+        with self._listener_lock:
+            if self._listener_pid == os.getpid():
+                return
+            self._listener_pid = os.getpid()
+            threading.Thread(
+                target=self._listen_for_invalidations, name="cache-invalidation", daemon=True
+            ).start()
+    
+    def _listen_for_invalidations(self):
+        while True:
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(INVALIDATION_CHANNEL)
+                # Anything cached while we were disconnected may have missed its invalidation
+                self.local.clear()
+                for message in pubsub.listen():
+                    self._handle_invalidation(message)
+            except Exception as e:
+                logger.error(f"Cache invalidation listener error: {e}")
+                self.local.clear()
+                time.sleep(settings.CACHE_LOCAL_TTL_SECONDS or 1)
+    
     def acquire_lock(self, lock_name: str, timeout: int = 10) -> bool:
         try:
             return self.client.set(f"lock:{lock_name}", "1", nx=True, ex=timeout)
@@ -47,7 +421,23 @@ class RedisCache:
             logger.error(f"Lock acquire error: {e}")
             return False
     
-    def release_lock(self, lock_name: str):
+    def acquire_locks(self, lock_names: List[str], timeout: int = 10) -> List[str]:
+        """Try several locks in one round trip; returns the names that were acquired"""
+        if not lock_names:
+            return []
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            for lock_name in lock_names:
+                pipe.set(f"lock:{lock_name}", "1", nx=True, ex=timeout)
+            return [name for name, acquired in zip(lock_names, pipe.execute()) if acquired]
+        except Exception as e:
+            logger.error(f"Lock acquire error: {e}")
+            return []
+    
+    def release_lock(self, lock_name: str, pipe=None):
+        if pipe is not None:
+            pipe.delete(f"lock:{lock_name}")
+            return
         try:
             self.client.delete(f"lock:{lock_name}")
         except Exception as e:
@@ -58,5 +448,13 @@ class RedisCache:
             self.client.publish(channel, json.dumps(message))
         except Exception as e:
             logger.error(f"Publish error: {e}")
+    
+    def stream_add(self, stream: str, messages: List[dict], pipe=None):
+        """Append messages to a stream in one pipelined round trip"""
+        if not messages:
+            return
+        with self._batch(pipe) as batch:
+            for message in messages:
+                batch.xadd(stream, {"data": json.dumps(message)})
 
 cache = RedisCache()
\ No newline at end of file
@@ -10,6 +10,15 @@ class Settings(BaseSettings):
     
     REDIS_URL: str
     CACHE_TTL: int = 300
+    CACHE_LOCAL_SIZE: int = 1000
+    CACHE_LOCAL_TTL_SECONDS: int = 5
+    CACHE_STALE_TTL_SECONDS: int = 60
+    CACHE_EARLY_REFRESH_BETA: float = 1.0
+    CACHE_COMPUTE_LOCK_SECONDS: int = 10
+    CACHE_COMPUTE_WAIT_MS: int = 100
+    CACHE_SERIALIZER: str = "orjson"
+    CACHE_COMPRESSION: str = "zlib"
+    CACHE_COMPRESS_MIN_BYTES: int = 1024
     
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
@@ -18,6 +27,25 @@ class Settings(BaseSettings):
     
     SYNC_INTERVAL_MINUTES: int = 15
     SYNC_TIMEOUT_SECONDS: int = 30
+    SYNC_MAX_CONCURRENCY: int = 8
+    SYNC_WORKER_MODE: str = "thread"
+    SYNC_ACCOUNT_LOCK_TIMEOUT_SECONDS: int = 300
+    PROVIDER_MAX_CONCURRENCY: int = 10
+    
+    ANOMALY_SWEEP_INTERVAL_MINUTES: int = 30
+    ANOMALY_SWEEP_CHUNK_SIZE: int = 200
+    
+    CATEGORY_CACHE_SIZE: int = 10000
+    CATEGORY_RULES_REFRESH_SECONDS: int = 60
+    
+    ALERT_STREAM_MAXLEN: int = 100000
+    ALERT_CONSUMER_BATCH_SIZE: int = 100
+    ALERT_CONSUMER_BLOCK_MS: int = 1000
+    ALERT_RETRY_IDLE_MS: int = 15000
+    ALERT_MAX_DELIVERIES: int = 5
+    ALERT_SSE_KEEPALIVE_SECONDS: int = 15
+    
+    EXPORT_BATCH_SIZE: int = 1000
     
     MAX_WORKERS: int = 4
     API_LATENCY_TARGET_MS: int = 150
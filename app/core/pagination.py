@@ -0,0 +1,18 @@
+from datetime import datetime
+from typing import Tuple
+import base64
+import json
+
+def encode_cursor(date: datetime, row_id: int) -> str:
+    """Opaque keyset cursor pointing just past a row in (date, id) order"""
+    raw = json.dumps([date.isoformat(), row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of encode_cursor; raises ValueError for anything it didn't produce"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        date, row_id = json.loads(raw)
+        return datetime.fromisoformat(date), int(row_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
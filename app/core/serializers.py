@@ -0,0 +1,121 @@
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+from typing import Any, Callable, Dict, Tuple
+import json
+import zlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # pragma: no cover - optional dependency
+    lz4_frame = None
+
+# Payloads start with a two-byte header: format, then compression. Entries written before
+# the header existed are plain JSON text, which never starts with these control bytes.
+FORMAT_JSON = 0x01
+FORMAT_ORJSON = 0x02
+FORMAT_MSGPACK = 0x03
+
+COMPRESSION_NONE = 0x00
+COMPRESSION_ZLIB = 0x01
+COMPRESSION_LZ4 = 0x02
+
+def _default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, Enum):
+        return value.value
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+def _json_dumps(value: Any) -> bytes:
+    return json.dumps(value, default=_default, separators=(",", ":")).encode()
+
+def _orjson_dumps(value: Any) -> bytes:
+    return orjson.dumps(value, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+def _msgpack_dumps(value: Any) -> bytes:
+    return msgpack.packb(value, default=_default, use_bin_type=True)
+
+def _msgpack_loads(payload: bytes) -> Any:
+    return msgpack.unpackb(payload, raw=False, strict_map_key=False)
+
+FORMATS: Dict[str, Tuple[int, Callable[[Any], bytes], Callable[[bytes], Any], bool]] = {
+    # name: (tag, dumps, loads, available)
+    "json": (FORMAT_JSON, _json_dumps, json.loads, True),
+    "orjson": (FORMAT_ORJSON, _orjson_dumps, orjson.loads if orjson else None, orjson is not None),
+    "msgpack": (FORMAT_MSGPACK, _msgpack_dumps, _msgpack_loads, msgpack is not None),
+}
+
+COMPRESSIONS: Dict[str, Tuple[int, Callable[[bytes], bytes], Callable[[bytes], bytes], bool]] = {
+    "none": (COMPRESSION_NONE, None, None, True),
+    "zlib": (COMPRESSION_ZLIB, lambda data: zlib.compress(data, 6), zlib.decompress, True),
+    "lz4": (
+        COMPRESSION_LZ4,
+        lz4_frame.compress if lz4_frame else None,
+        lz4_frame.decompress if lz4_frame else None,
+        lz4_frame is not None
+    ),
+}
+
+FORMAT_TAGS = {tag for tag, _, _, _ in FORMATS.values()}
+LOADERS = {tag: loads for tag, _, loads, available in FORMATS.values() if available}
+DECOMPRESSORS = {tag: decompress for tag, _, decompress, available in COMPRESSIONS.values() if available}
+
+class Serializer:
+    """Encodes cache payloads with a format tag so any configured codec can read older entries"""
+    
+    def __init__(self, format: str = "json", compression: str = "none", compress_min_bytes: int = 1024):
+        if format not in FORMATS:
+            raise ValueError(f"Unknown cache serializer: {format}")
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown cache compression: {compression}")
+        
+        if not FORMATS[format][3]:
+            logger.warning(f"Cache serializer {format} is not installed; falling back to json")
+            format = "json"
+        if not COMPRESSIONS[compression][3]:
+            logger.warning(f"Cache compression {compression} is not installed; falling back to zlib")
+            compression = "zlib"
+        
+        self.format = format
+        self.compression = compression
+        self.compress_min_bytes = compress_min_bytes
+        self._format_tag, self._dumps, _, _ = FORMATS[format]
+        self._compression_tag, self._compress, _, _ = COMPRESSIONS[compression]
+    
+    def dumps(self, value: Any) -> bytes:
+        payload = self._dumps(value)
+        if self._compress is not None and len(payload) >= self.compress_min_bytes:
+            return bytes((self._format_tag, self._compression_tag)) + self._compress(payload)
+        return bytes((self._format_tag, COMPRESSION_NONE)) + payload
+    
+    @staticmethod
+    def loads(data: bytes) -> Any:
+        if not data:
+            return None
+        if data[0] not in FORMAT_TAGS:
+            return json.loads(data)  # legacy untagged JSON text
+        if len(data) < 2:
+            raise ValueError(f"Truncated cache payload {data.hex()}")
+        if data[0] not in LOADERS or data[1] not in DECOMPRESSORS:
+            raise ValueError(f"No codec installed for cache payload header {data[:2].hex()}")
+        
+        payload = data[2:]
+        if data[1] != COMPRESSION_NONE:
+            payload = DECOMPRESSORS[data[1]](payload)
+        return LOADERS[data[0]](payload)
@@ -0,0 +1,38 @@
+from contextlib import contextmanager
+from typing import Dict, List, Iterator
+import time
+
+class StageTimer:
+    """Accumulates wall time and item counts per named pipeline stage"""
+    
+    def __init__(self):
+        self.stages: Dict[str, Dict[str, float]] = {}
+    
+    def add(self, name: str, seconds: float, count: int = 0):
+        entry = self.stages.setdefault(name, {"seconds": 0.0, "count": 0})
+        entry["seconds"] += seconds
+        entry["count"] += count
+    
+    @contextmanager
+    def stage(self, name: str, count: int = 0) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start, count)
+    
+    def to_dict(self) -> Dict[str, Dict[str, float]]:
+        return {
+            name: {"seconds": round(entry["seconds"], 6), "count": int(entry["count"])}
+            for name, entry in self.stages.items()
+        }
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Linear-interpolated percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    
+    rank = (len(sorted_values) - 1) * pct / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (rank - lower)
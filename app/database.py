@@ -31,5 +31,42 @@ def get_db() -> Generator[Session, None, None]:
     finally:
         db.close()
 
+# Schema changes made after a table first shipped, which create_all won't apply to it
+ADDED_COLUMNS = {
+    "budgets": {"warning_sent": "BOOLEAN DEFAULT FALSE"},
+    "categories": {"updated_at": "TIMESTAMP"},
+}
+ADDED_INDEXES = {
+    "transactions": ["idx_account_date_id", "idx_date_id"],
+}
+RETIRED_INDEXES = {
+    "transactions": ["idx_account_date"],  # superseded by idx_account_date_id
+}
+
+def upgrade_schema(bind=None):
+    """Apply changes create_all can't make to tables that already exist; safe to rerun"""
+    from sqlalchemy import inspect, text
+    
+    bind = bind or engine
+    inspector = inspect(bind)
+    tables = set(inspector.get_table_names())
+    
+    with bind.begin() as conn:
+        for name in tables & ADDED_COLUMNS.keys():
+            columns = {column["name"] for column in inspector.get_columns(name)}
+            for column, ddl in ADDED_COLUMNS[name].items():
+                if column not in columns:
+                    conn.execute(text(f"ALTER TABLE {name} ADD COLUMN {column} {ddl}"))
+        
+        for name in tables & (ADDED_INDEXES.keys() | RETIRED_INDEXES.keys()):
+            existing = {index["name"] for index in inspector.get_indexes(name)}
+            for index in Base.metadata.tables[name].indexes:
+                if index.name in ADDED_INDEXES.get(name, []) and index.name not in existing:
+                    index.create(conn)
+            for retired in RETIRED_INDEXES.get(name, []):
+                if retired in existing:
+                    conn.execute(text(f"DROP INDEX {retired}"))
+
 def init_db():
     Base.metadata.create_all(bind=engine)
+    upgrade_schema()
@@ -3,6 +3,7 @@ from app.models.user import User
 from app.models.category import Category
 from app.core.security import get_password_hash
 from app.generator.account_generator import AccountGenerator
+from app.services.categorization_service import CategorizationService
 from datetime import datetime
 import logging
 
@@ -27,6 +28,7 @@ class SeedData:
                 db.add(category)
         
         db.commit()
+        CategorizationService.bump_rules_version()
         logger.info("Categories seeded")
     
     @staticmethod
@@ -1,16 +1,153 @@
 from app.cache import cache
+from app.config import get_settings
+from app.services.alert_service import ALERT_STREAM
+from redis.exceptions import ResponseError
+from typing import Dict, List, Optional, Tuple
+import json
+import os
+import socket
+import threading
+import time
 import logging
 
 logger = logging.getLogger(__name__)
+settings = get_settings()
 
-def process_alerts():
+ALERT_GROUP = "alert-workers"
+DEAD_LETTER_STREAM = "alerts:dead"
+CONSUMER_NAME = f"{socket.gethostname()}-{os.getpid()}"
+RETRY_BACKOFF_SECONDS = 5
+
+_stop_event = threading.Event()
+_worker: Optional[threading.Thread] = None
+
+def ensure_group(client=None):
+    client = client or cache.client
     try:
-        pubsub = cache.client.pubsub()
-        pubsub.subscribe("alerts")
-        
-        message = pubsub.get_message()
-        if message and message['type'] == 'message':
-            logger.info(f"Alert received: {message['data']}")
-            
-    except Exception as e:
-        logger.error(f"Alert processing error: {e}")
\ No newline at end of file
+        client.xgroup_create(ALERT_STREAM, ALERT_GROUP, id="0", mkstream=True)
+    except ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+def handle_alert(alert: dict):
+    """Deliver one alert; raising leaves it pending so it is retried"""
+    logger.info(
+        f"Alert delivered: {alert.get('type')} for user {alert.get('user_id')} "
+        f"({alert.get('alert_type') or alert.get('anomaly_type')})"
+    )
+
+def _delivery_counts(client, message_ids: List[str]) -> Dict[str, int]:
+    if not message_ids:
+        return {}
+    # One exact-id query per entry, pipelined: a single range query's count cap can be used
+    # up by other pending entries in the range, leaving claimed ids without a count
+    pipe = client.pipeline(transaction=False)
+    for message_id in message_ids:
+        pipe.xpending_range(ALERT_STREAM, ALERT_GROUP, min=message_id, max=message_id, count=1)
+    return {
+        entry["message_id"]: entry["times_delivered"]
+        for pending in pipe.execute()
+        for entry in pending
+    }
+
+def process_batch(client=None, consumer: str = CONSUMER_NAME) -> dict:
+    """Retry stale pending alerts, read new ones, then ack and trim in bulk"""
+    client = client or cache.client
+    stats = {"delivered": 0, "failed": 0, "retried": 0, "dead_lettered": 0}
+    acked = []
+    
+    # Entries left pending by a failed handler or a dead consumer
+    claimed = client.xautoclaim(
+        ALERT_STREAM, ALERT_GROUP, consumer,
+        min_idle_time=settings.ALERT_RETRY_IDLE_MS,
+        count=settings.ALERT_CONSUMER_BATCH_SIZE
+    )[1]
+    deliveries = _delivery_counts(client, [message_id for message_id, _ in claimed])
+    
+    entries: List[Tuple[str, Optional[dict]]] = []
+    for message_id, fields in claimed:
+        if not fields:
+            acked.append(message_id)  # trimmed before it could be retried
+        elif deliveries.get(message_id, 0) > settings.ALERT_MAX_DELIVERIES:
+            client.xadd(DEAD_LETTER_STREAM, fields, maxlen=settings.ALERT_STREAM_MAXLEN)
+            acked.append(message_id)
+            stats["dead_lettered"] += 1
+        else:
+            entries.append((message_id, fields))
+            stats["retried"] += 1
+    
+    for _, messages in client.xreadgroup(
+        ALERT_GROUP, consumer, {ALERT_STREAM: ">"},
+        count=settings.ALERT_CONSUMER_BATCH_SIZE,
+        block=settings.ALERT_CONSUMER_BLOCK_MS
+    ) or []:
+        entries.extend(messages)
+    
+    for message_id, fields in entries:
+        try:
+            handle_alert(json.loads(fields["data"]))
+            acked.append(message_id)
+            stats["delivered"] += 1
+        except Exception as e:
+            logger.error(f"Alert {message_id} delivery error: {e}")
+            stats["failed"] += 1
+    
+    if acked:
+        client.xack(ALERT_STREAM, ALERT_GROUP, *acked)
+        client.xtrim(ALERT_STREAM, maxlen=settings.ALERT_STREAM_MAXLEN, approximate=True)
+    
+    return stats
+
+def get_consumer_lag(client=None) -> dict:
+    """Backlog of the consumer group and the age of its oldest undelivered alert"""
+    client = client or cache.client
+    group = next(
+        (g for g in client.xinfo_groups(ALERT_STREAM) if g["name"] == ALERT_GROUP),
+        None
+    )
+    if group is None:
+        return {"pending": 0, "lag": None, "lag_seconds": 0.0}
+    
+    lag_seconds = 0.0
+    oldest = client.xrange(ALERT_STREAM, min=f"({group['last-delivered-id']}", count=1)
+    if oldest:
+        # Stream ids start with the millisecond timestamp they were added at
+        added_ms = int(oldest[0][0].split("-")[0])
+        lag_seconds = max(0.0, time.time() - added_ms / 1000)
+    
+    return {
+        "pending": group["pending"],
+        "lag": group.get("lag"),
+        "lag_seconds": round(lag_seconds, 3),
+        "target_seconds": settings.ALERT_LATENCY_TARGET_SECONDS
+    }
+
+def run_alert_consumer(stop_event: threading.Event):
+    group_ready = False
+    while not stop_event.is_set():
+        try:
+            if not group_ready:
+                ensure_group()
+                group_ready = True
+            process_batch()
+        except Exception as e:
+            logger.error(f"Alert processing error: {e}")
+            group_ready = False
+            stop_event.wait(RETRY_BACKOFF_SECONDS)
+
+def start_alert_consumer():
+    global _worker
+    if _worker and _worker.is_alive():
+        return
+    _stop_event.clear()
+    _worker = threading.Thread(
+        target=run_alert_consumer, args=(_stop_event,), name="alert-consumer", daemon=True
+    )
+    _worker.start()
+    logger.info(f"Alert consumer {CONSUMER_NAME} started")
+
+def stop_alert_consumer():
+    _stop_event.set()
+    if _worker:
+        _worker.join(timeout=settings.ALERT_CONSUMER_BLOCK_MS / 1000 + 1)
+        logger.info("Alert consumer stopped")
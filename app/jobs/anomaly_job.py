@@ -0,0 +1,49 @@
+from app.database import SessionLocal
+from app.models.account import Account
+from app.services.anomaly_service import AnomalyService
+from app.config import get_settings
+from app.cache import cache
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+def run_anomaly_sweep() -> dict:
+    stats = {"accounts": 0, "chunks": 0, "failed_chunks": 0, "anomalies": 0}
+    
+    if not cache.acquire_lock("anomaly_sweep", timeout=settings.ANOMALY_SWEEP_INTERVAL_MINUTES * 60):
+        logger.info("Anomaly sweep already running, skipping")
+        return stats
+    
+    start_time = time.time()
+    db = SessionLocal()
+    try:
+        account_ids = [
+            row.id for row in db.query(Account.id).filter(
+                Account.is_active == True
+            ).order_by(Account.id)
+        ]
+        stats["accounts"] = len(account_ids)
+        
+        chunk_size = max(1, settings.ANOMALY_SWEEP_CHUNK_SIZE)
+        for i in range(0, len(account_ids), chunk_size):
+            chunk = account_ids[i:i + chunk_size]
+            try:
+                results = AnomalyService.sweep_accounts(db, chunk)
+                stats["chunks"] += 1
+                stats["anomalies"] += sum(len(anomalies) for anomalies in results.values())
+            except Exception as e:
+                logger.error(f"Anomaly sweep failed for accounts {chunk[0]}-{chunk[-1]}: {e}")
+                db.rollback()
+                stats["failed_chunks"] += 1
+        
+    except Exception as e:
+        logger.error(f"Anomaly sweep error: {e}")
+    finally:
+        db.close()
+        cache.release_lock("anomaly_sweep")
+    
+    stats["duration_seconds"] = round(time.time() - start_time, 3)
+    logger.info(f"Anomaly sweep completed: {stats}")
+    return stats
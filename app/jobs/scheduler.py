@@ -1,7 +1,7 @@
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 from app.jobs.sync_job import run_sync_jobs
-from app.jobs.alert_job import process_alerts
+from app.jobs.anomaly_job import run_anomaly_sweep
 from app.config import get_settings
 import logging
 
@@ -21,10 +21,10 @@ def start_scheduler():
         )
         
         scheduler.add_job(
-            process_alerts,
-            trigger=IntervalTrigger(minutes=1),
-            id="process_alerts",
-            name="Process pending alerts",
+            run_anomaly_sweep,
+            trigger=IntervalTrigger(minutes=settings.ANOMALY_SWEEP_INTERVAL_MINUTES),
+            id="anomaly_sweep",
+            name="Score anomalies for all accounts",
             replace_existing=True
         )
         
@@ -1,33 +1,236 @@
-from app.database import SessionLocal
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from typing import Optional, List, Dict, Any, AsyncIterator, Iterable, Iterator, Set, Tuple
+from app.database import SessionLocal, engine
 from app.models.account import Account
+from app.providers.provider_registry import provider_registry
+from app.providers.base_provider import TransactionPage
 from app.services.sync_service import SyncService
+from app.core.security import decrypt_token
+from app.config import get_settings
 from app.cache import cache
+import asyncio
+import functools
+import time
 import logging
 
 logger = logging.getLogger(__name__)
+settings = get_settings()
 
-def run_sync_jobs():
-    if not cache.acquire_lock("sync_job", timeout=300):
-        logger.info("Sync job already running, skipping")
-        return
+def _init_worker_process():
+    # Forked workers must not reuse the parent's pooled connections
+    engine.dispose(close=False)
+
+def _acquire_account_lock(account_id: int) -> bool:
+    return cache.acquire_lock(
+        f"sync_account:{account_id}", timeout=settings.SYNC_ACCOUNT_LOCK_TIMEOUT_SECONDS
+    )
+
+def _acquire_account_locks(account_ids: List[int]) -> Set[int]:
+    """Lock a run's accounts in one round trip; returns the ids that were free"""
+    acquired = set(cache.acquire_locks(
+        [f"sync_account:{account_id}" for account_id in account_ids],
+        timeout=settings.SYNC_ACCOUNT_LOCK_TIMEOUT_SECONDS
+    ))
+    return {account_id for account_id in account_ids if f"sync_account:{account_id}" in acquired}
+
+def _release_account_locks(account_ids: Iterable[int]):
+    with cache.pipeline() as pipe:
+        for account_id in account_ids:
+            cache.release_lock(f"sync_account:{account_id}", pipe=pipe)
+
+def _sync_locked(
+    account_id: int,
+    raw_transactions: Optional[List[Dict[str, Any]]] = None,
+    pages: Optional[Iterable[TransactionPage]] = None
+) -> dict:
+    db = SessionLocal()
+    try:
+        return SyncService.sync_account(db, account_id, raw_transactions, pages=pages)
+    finally:
+        db.close()
+
+def sync_account_job(
+    account_id: int,
+    raw_transactions: Optional[List[Dict[str, Any]]] = None
+) -> dict:
+    if not _acquire_account_lock(account_id):
+        return {"status": "skipped", "account_id": account_id}
     
     try:
-        db = SessionLocal()
-        accounts = db.query(Account).filter(Account.is_active == True).all()
-        
-        logger.info(f"Starting sync for {len(accounts)} accounts")
+        return _sync_locked(account_id, raw_transactions)
+    finally:
+        cache.release_lock(f"sync_account:{account_id}")
+
+class _PageFeed:
+    """Hands pages fetched on the event loop to a sync running in a worker thread.
+    
+    A page is only fetched once the sync asks for it, after committing the previous one,
+    so memory stays at one page and a failed sync resumes from its last committed cursor.
+    SYNC_TIMEOUT_SECONDS bounds the time spent fetching, not ingesting.
+    """
+    
+    def __init__(
+        self,
+        pages: AsyncIterator[TransactionPage],
+        loop: asyncio.AbstractEventLoop,
+        provider_slots: asyncio.Semaphore
+    ):
+        self._pages = pages
+        self._loop = loop
+        self._provider_slots = provider_slots
+        self._remaining = float(settings.SYNC_TIMEOUT_SECONDS)
+    
+    def __iter__(self):
+        return self
+    
+    def __next__(self) -> TransactionPage:
+        page = asyncio.run_coroutine_threadsafe(self._fetch(), self._loop).result()
+        if page is None:
+            raise StopIteration
+        return page
+    
+    async def _fetch(self) -> Optional[TransactionPage]:
+        async with self._provider_slots:
+            started = self._loop.time()
+            try:
+                return await asyncio.wait_for(self._pages.__anext__(), timeout=self._remaining)
+            except StopAsyncIteration:
+                return None
+            finally:
+                self._remaining = max(0.0, self._remaining - (self._loop.time() - started))
+
+async def _fetch_and_sync(
+    account: Account,
+    provider_slots: asyncio.Semaphore,
+    ingest_slots: asyncio.Semaphore,
+    executor: ThreadPoolExecutor
+) -> dict:
+    """Sync an account whose lock the caller already holds"""
+    provider = provider_registry.get_provider(account.provider_id)
+    loop = asyncio.get_running_loop()
+    
+    # Page from the persisted cursor, as the pooled path does, streaming each page into
+    # the sync as it arrives
+    pages = _PageFeed(
+        provider.aiter_transaction_pages(
+            decrypt_token(account.access_token_encrypted),
+            account.provider_account_id,
+            account.sync_cursor,
+            account.last_synced
+        ),
+        loop,
+        provider_slots
+    )
+    
+    # DB work stays synchronous; run it off the event loop with bounded parallelism
+    async with ingest_slots:
+        return await loop.run_in_executor(
+            executor, functools.partial(_sync_locked, account.id, pages=pages)
+        )
+
+async def run_async_sync(accounts: List[Account], max_workers: int) -> List[Tuple[int, Any]]:
+    """Overlap provider fetches across locked accounts with one semaphore per provider"""
+    provider_slots = {
+        provider_id: asyncio.Semaphore(settings.PROVIDER_MAX_CONCURRENCY)
+        for provider_id in {account.provider_id for account in accounts}
+    }
+    ingest_slots = asyncio.Semaphore(max_workers)
+    
+    # Syncs block on page fetches that run in the default executor, so they get their own
+    # threads and can never starve those fetches
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sync-ingest") as executor:
+        results = await asyncio.gather(
+            *[
+                _fetch_and_sync(account, provider_slots[account.provider_id], ingest_slots, executor)
+                for account in accounts
+            ],
+            return_exceptions=True
+        )
+    return [(account.id, result) for account, result in zip(accounts, results)]
+
+def _create_executor(max_workers: int):
+    if settings.SYNC_WORKER_MODE == "process":
+        return ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker_process)
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sync")
+
+def _run_pool(account_ids: List[int], max_workers: int) -> Iterator[Tuple[int, Any]]:
+    with _create_executor(max_workers) as executor:
+        futures = {
+            executor.submit(_sync_locked, account_id): account_id
+            for account_id in account_ids
+        }
         
-        for account in accounts:
+        for future in as_completed(futures):
             try:
-                result = SyncService.sync_account(db, account.id)
-                logger.info(f"Account {account.id} sync result: {result}")
+                yield futures[future], future.result()
             except Exception as e:
-                logger.error(f"Failed to sync account {account.id}: {e}")
+                yield futures[future], e
+
+def run_sync_jobs(max_workers: Optional[int] = None) -> dict:
+    start_time = time.time()
+    stats = {
+        "accounts": 0,
+        "succeeded": 0,
+        "failed": 0,
+        "skipped": 0,
+        "records_fetched": 0,
+        "records_inserted": 0,
+        "records_deduplicated": 0
+    }
+    
+    try:
+        db = SessionLocal()
+        try:
+            accounts = db.query(Account).filter(Account.is_active == True).all()
+        finally:
+            db.close()
         
-        db.close()
-        logger.info("Sync job completed")
+        stats["accounts"] = len(accounts)
+        
+        # Lock every account up front so an account that is already syncing costs no provider
+        # call; the locks are held until the whole run finishes and released together
+        locked = _acquire_account_locks([account.id for account in accounts])
+        stats["skipped"] = len(accounts) - len(locked)
+        accounts = [account for account in accounts if account.id in locked]
+        
+        max_workers = max(1, min(max_workers or settings.SYNC_MAX_CONCURRENCY, len(accounts) or 1))
+        logger.info(
+            f"Starting {settings.SYNC_WORKER_MODE} sync for {len(accounts)} accounts "
+            f"with {max_workers} workers"
+        )
+        
+        try:
+            if settings.SYNC_WORKER_MODE == "async":
+                results = asyncio.run(run_async_sync(accounts, max_workers))
+            else:
+                results = _run_pool([account.id for account in accounts], max_workers)
+            
+            for account_id, result in results:
+                if isinstance(result, BaseException):
+                    logger.error(f"Failed to sync account {account_id}: {result}")
+                    stats["failed"] += 1
+                    continue
+                
+                status = result.get("status")
+                if status == "success":
+                    stats["succeeded"] += 1
+                    for key in ("records_fetched", "records_inserted", "records_deduplicated"):
+                        stats[key] += result.get(key, 0)
+                elif status == "skipped":
+                    stats["skipped"] += 1
+                else:
+                    stats["failed"] += 1
+                logger.debug(f"Account {account_id} sync result: {result}")
+        finally:
+            _release_account_locks(locked)
         
     except Exception as e:
         logger.error(f"Sync job error: {e}")
-    finally:
-        cache.release_lock("sync_job")
\ No newline at end of file
+    
+    duration = time.time() - start_time
+    stats["duration_seconds"] = round(duration, 3)
+    stats["accounts_per_second"] = round(stats["succeeded"] / duration, 2) if duration > 0 else 0.0
+    stats["records_per_second"] = round(stats["records_fetched"] / duration, 2) if duration > 0 else 0.0
+    logger.info(f"Sync job completed: {stats}")
+    
+    return stats
@@ -5,6 +5,7 @@ from app.config import get_settings
 from app.logging_config import setup_logging
 from app.database import init_db
 from app.jobs.scheduler import start_scheduler, stop_scheduler
+from app.jobs.alert_job import start_alert_consumer, stop_alert_consumer, get_consumer_lag
 from app.routers import (
     auth_router,
     accounts_router,
@@ -12,6 +13,7 @@ from app.routers import (
     budgets_router,
     categories_router,
     anomalies_router,
+    alerts_router,
     sync_router
 )
 import logging
@@ -26,11 +28,13 @@ async def lifespan(app: FastAPI):
     logger.info("Starting application...")
     init_db()
     start_scheduler()
+    start_alert_consumer()
     logger.info("Application started successfully")
     
     yield
     
     logger.info("Shutting down application...")
+    stop_alert_consumer()
     stop_scheduler()
     logger.info("Application shut down")
 
@@ -58,6 +62,7 @@ app.include_router(transactions_router.router)
 app.include_router(budgets_router.router)
 app.include_router(categories_router.router)
 app.include_router(anomalies_router.router)
+app.include_router(alerts_router.router)
 app.include_router(sync_router.router)
 
 @app.get("/")
@@ -77,6 +82,19 @@ def health_check():
         "timestamp": datetime.utcnow().isoformat()
     }
 
+@app.get("/health/alerts")
+def alert_consumer_health():
+    try:
+        return {"status": "ok", **get_consumer_lag()}
+    except Exception as e:
+        logger.error(f"Alert lag check error: {e}")
+        return {"status": "unavailable"}
+
+@app.get("/health/cache")
+def cache_health():
+    from app.cache import cache
+    return cache.stats()
+
 @app.get("/providers")
 def list_providers():
     from app.providers.provider_registry import provider_registry
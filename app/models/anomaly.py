@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, String, Float, Text, ForeignKey, Index
+from datetime import datetime, timezone
+from app.database import Base
+from app.models.custom_types import TZDateTime
+
+class Anomaly(Base):
+    __tablename__ = "anomalies"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    account_id = Column(Integer, ForeignKey("accounts.id", ondelete="CASCADE"), nullable=False)
+    transaction_id = Column(Integer, ForeignKey("transactions.id", ondelete="CASCADE"), nullable=False)
+    type = Column(String, nullable=False)
+    severity = Column(String, nullable=False)
+    description = Column(Text)
+    z_score = Column(Float)
+    date = Column(TZDateTime, nullable=False)
+    detected_at = Column(TZDateTime, default=lambda: datetime.now(timezone.utc))
+    
+    __table_args__ = (
+        Index('idx_anomaly_account_date', 'account_id', 'date'),
+    )
@@ -20,6 +20,7 @@ class Budget(Base):
     period = Column(Enum(BudgetPeriod), default=BudgetPeriod.MONTHLY)
     current_spend = Column(Float, default=0.0)
     alert_sent = Column(Boolean, default=False)
+    warning_sent = Column(Boolean, default=False)
     period_start = Column(TZDateTime, default=lambda: datetime.now(timezone.utc))
     created_at = Column(TZDateTime, default=lambda: datetime.now(timezone.utc))
     updated_at = Column(TZDateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
@@ -14,6 +14,7 @@ class Category(Base):
     merchants = Column(Text)  
     parent_category_id = Column(Integer, ForeignKey("categories.id"), nullable=True)
     created_at = Column(TZDateTime, default=lambda: datetime.now(timezone.utc))
+    updated_at = Column(TZDateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
     
     budgets = relationship("Budget", back_populates="category")
     parent = relationship("Category", remote_side=[id], backref="subcategories")
\ No newline at end of file
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, UniqueConstraint
+from datetime import datetime, timezone
+from app.database import Base
+from app.models.custom_types import TZDateTime
+
+class CategoryStats(Base):
+    __tablename__ = "category_stats"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    account_id = Column(Integer, ForeignKey("accounts.id", ondelete="CASCADE"), nullable=False)
+    category = Column(String, nullable=False)
+    count = Column(Integer, default=0, nullable=False)
+    mean = Column(Float, default=0.0, nullable=False)
+    m2 = Column(Float, default=0.0, nullable=False)  # Welford sum of squared deviations
+    created_at = Column(TZDateTime, default=lambda: datetime.now(timezone.utc))
+    updated_at = Column(TZDateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+    
+    __table_args__ = (
+        UniqueConstraint('account_id', 'category', name='uq_category_stats_account_category'),
+    )
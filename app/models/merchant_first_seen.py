@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, UniqueConstraint
+from datetime import datetime, timezone
+from app.database import Base
+from app.models.custom_types import TZDateTime
+
+class MerchantFirstSeen(Base):
+    __tablename__ = "merchant_first_seen"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    account_id = Column(Integer, ForeignKey("accounts.id", ondelete="CASCADE"), nullable=False)
+    merchant_key = Column(String, nullable=False)
+    first_seen_date = Column(TZDateTime, nullable=False)
+    created_at = Column(TZDateTime, default=lambda: datetime.now(timezone.utc))
+    
+    __table_args__ = (
+        UniqueConstraint('account_id', 'merchant_key', name='uq_merchant_first_seen_account_merchant'),
+    )
@@ -26,6 +26,8 @@ class Transaction(Base):
     audit_logs = relationship("AuditLog", back_populates="transaction", cascade="all, delete-orphan")
     
     __table_args__ = (
-        Index('idx_account_date', 'account_id', 'date'),
+        # (date, id) matches the keyset order of GET /transactions, per account and user-wide
+        Index('idx_account_date_id', 'account_id', 'date', 'id'),
+        Index('idx_date_id', 'date', 'id'),
         Index('idx_category_date', 'category', 'date'),
     )
\ No newline at end of file
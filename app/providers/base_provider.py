@@ -1,6 +1,14 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, AsyncIterator, Iterator, Optional
 from datetime import datetime
+import asyncio
+
+@dataclass
+class TransactionPage:
+    transactions: List[Dict[str, Any]] = field(default_factory=list)
+    next_cursor: Optional[str] = None
+    has_more: bool = False
 
 class BaseProvider(ABC):
     
@@ -25,5 +33,67 @@ class BaseProvider(ABC):
     ) -> List[Dict[str, Any]]:
         pass
     
+    def fetch_transactions_page(
+        self,
+        token: str,
+        account_id: str,
+        cursor: Optional[str] = None,
+        since_date: datetime = None
+    ) -> TransactionPage:
+        """Fetch one page after an opaque cursor; list-based providers return a single page"""
+        return TransactionPage(transactions=self.fetch_transactions(token, account_id, since_date))
+    
+    def iter_transaction_pages(
+        self,
+        token: str,
+        account_id: str,
+        cursor: Optional[str] = None,
+        since_date: datetime = None
+    ) -> Iterator[TransactionPage]:
+        while True:
+            page = self.fetch_transactions_page(token, account_id, cursor, since_date)
+            yield page
+            if not page.has_more:
+                return
+            cursor = page.next_cursor
+    
+    async def afetch_accounts(self, token: str) -> List[Dict[str, Any]]:
+        """Async adapter; I/O-bound providers should override with a native client"""
+        return await asyncio.to_thread(self.fetch_accounts, token)
+    
+    async def afetch_transactions(
+        self,
+        token: str,
+        account_id: str,
+        since_date: datetime = None
+    ) -> List[Dict[str, Any]]:
+        """Async adapter; I/O-bound providers should override with a native client"""
+        return await asyncio.to_thread(self.fetch_transactions, token, account_id, since_date)
+    
+    async def aiter_transaction_pages(
+        self,
+        token: str,
+        account_id: str,
+        cursor: Optional[str] = None,
+        since_date: datetime = None
+    ) -> AsyncIterator[TransactionPage]:
+        """Async adapter for iter_transaction_pages that fetches one page at a time off the loop.
+        
+        A running thread can't be interrupted, so when the caller is cancelled (e.g. by
+        asyncio.wait_for) this waits for the in-flight page fetch before raising. A caller
+        holding the account lock therefore keeps it until the provider call has stopped.
+        """
+        pages = self.iter_transaction_pages(token, account_id, cursor, since_date)
+        while True:
+            fetch = asyncio.ensure_future(asyncio.to_thread(next, pages, None))
+            try:
+                page = await asyncio.shield(fetch)
+            except asyncio.CancelledError:
+                await asyncio.wait({fetch})
+                raise
+            if page is None:
+                return
+            yield page
+    
     def validate_token(self, token: str) -> bool:
-        return True  
\ No newline at end of file
+        return True  
@@ -19,20 +19,14 @@ def list_accounts(
     db: Session = Depends(get_db)
 ):
 
-    cache_key = f"user:{current_user.id}:accounts"
+    def load_accounts():
+        accounts = db.query(Account).filter(
+            Account.user_id == current_user.id,
+            Account.is_active == True
+        ).all()
+        return [AccountResponse.from_orm(a).dict() for a in accounts]
     
-    cached = cache.get(cache_key)
-    if cached:
-        return cached
-    
-    accounts = db.query(Account).filter(
-        Account.user_id == current_user.id,
-        Account.is_active == True
-    ).all()
-    
-    cache.set(cache_key, [AccountResponse.from_orm(a).dict() for a in accounts])
-    
-    return accounts
+    return cache.get_or_compute(f"user:{current_user.id}:accounts", load_accounts)
 
 @router.get("/{account_id}", response_model=AccountResponse)
 def get_account(
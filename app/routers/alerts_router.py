@@ -0,0 +1,43 @@
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator
+from app.config import get_settings
+from app.dependencies import get_current_user
+from app.models.user import User
+from app.services.alert_broadcaster import alert_broadcaster
+import asyncio
+import json
+
+router = APIRouter(prefix="/alerts", tags=["Alerts"])
+settings = get_settings()
+
+def format_event(alert: dict) -> str:
+    return f"event: {alert.get('type', 'alert')}\ndata: {json.dumps(alert)}\n\n"
+
+async def alert_events(request: Request, user_id: int) -> AsyncIterator[str]:
+    queue = alert_broadcaster.subscribe(user_id)
+    try:
+        yield ": connected\n\n"
+        while not await request.is_disconnected():
+            try:
+                alert = await asyncio.wait_for(
+                    queue.get(), timeout=settings.ALERT_SSE_KEEPALIVE_SECONDS
+                )
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            yield format_event(alert)
+    finally:
+        alert_broadcaster.unsubscribe(user_id, queue)
+
+@router.get("/stream")
+async def stream_alerts(
+    request: Request,
+    current_user: User = Depends(get_current_user)
+):
+    """Server-sent events carrying the user's budget and anomaly alerts as they are published"""
+    return StreamingResponse(
+        alert_events(request, current_user.id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
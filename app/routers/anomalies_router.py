@@ -24,5 +24,5 @@ def detect_account_anomalies(
     if not account:
         raise HTTPException(status_code=404, detail="Account not found")
     
-    anomalies = AnomalyService.detect_anomalies(db, account_id, days_lookback)
+    anomalies = AnomalyService.get_anomalies(db, account_id, days_lookback)
     return {"account_id": account_id, "anomalies": anomalies}
\ No newline at end of file
@@ -1,12 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+from datetime import datetime
 from app.database import get_db
 from app.dependencies import get_current_user
 from app.models.user import User
 from app.models.budget import Budget
 from app.schemas.budget_schemas import BudgetCreate, BudgetUpdate, BudgetResponse
 from app.services.budget_service import BudgetService
+from app.services.budget_ledger_service import BudgetLedgerService
 
 router = APIRouter(prefix="/budgets", tags=["Budgets"])
 
@@ -39,6 +41,15 @@ def list_budgets(
     statuses = BudgetService.get_budget_status(db, current_user.id)
     return [BudgetResponse(**s) for s in statuses]
 
+@router.get("/spend")
+def get_budget_spend(
+    date: Optional[datetime] = Query(None, description="Any moment inside the period to report"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Spend per budget for the calendar week/month, recomputed from the ledger"""
+    return {"budgets": BudgetLedgerService.get_report(db, current_user.id, date)}
+
 @router.delete("/{budget_id}")
 def delete_budget(
     budget_id: int,
@@ -55,4 +66,5 @@ def delete_budget(
     
     db.delete(budget)
     db.commit()
+    BudgetLedgerService.invalidate_user(current_user.id)
     return {"status": "success"}
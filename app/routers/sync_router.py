@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Query
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.dependencies import get_current_user
@@ -51,3 +51,22 @@ def get_sync_logs(
     ).order_by(SyncCursor.created_at.desc()).limit(limit).all()
     
     return {"account_id": account_id, "logs": logs}
+
+@router.get("/stats/account/{account_id}")
+def get_sync_stage_stats(
+    account_id: int,
+    limit: int = Query(50, ge=1, le=500),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    
+    account = db.query(Account).filter(
+        Account.id == account_id,
+        Account.user_id == current_user.id
+    ).first()
+    
+    if not account:
+        raise HTTPException(status_code=404, detail="Account not found")
+    
+    stats = SyncService.get_stage_percentiles(db, account_id, limit)
+    return {"account_id": account_id, **stats}
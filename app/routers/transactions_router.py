@@ -1,44 +1,144 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, tuple_
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Iterator, List, Optional, Union
 from datetime import datetime
 from app.database import get_db
 from app.dependencies import get_current_user
 from app.models.user import User
 from app.models.transaction import Transaction
 from app.models.account import Account
-from app.schemas.transaction_schemas import TransactionResponse, TransactionReconcile, TransactionFilter
+from app.schemas.transaction_schemas import TransactionResponse, TransactionPage, TransactionReconcile, TransactionFilter
 from app.services.reconciliation_service import ReconciliationService
 from app.services.delta_history_service import DeltaHistoryService
+from app.core.pagination import encode_cursor, decode_cursor
+from app.config import get_settings
 from app.cache import cache
+import csv
+import io
+import json
 
 router = APIRouter(prefix="/transactions", tags=["Transactions"])
+settings = get_settings()
 
-@router.get("/", response_model=List[TransactionResponse])
+# Same fields as TransactionResponse, selected as plain columns so exports skip the ORM
+EXPORT_COLUMNS = [
+    Transaction.id,
+    Transaction.account_id,
+    Transaction.provider_txn_id,
+    Transaction.date,
+    Transaction.amount,
+    Transaction.description,
+    Transaction.merchant,
+    Transaction.category,
+    Transaction.status,
+    Transaction.is_duplicate,
+    Transaction.is_anomaly,
+    Transaction.created_at
+]
+EXPORT_FIELDS = [column.key for column in EXPORT_COLUMNS]
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+def _apply_filters(query, account_id, category, start_date, end_date):
+    # Works for both Query and select(), so listing and export filter identically
+    if account_id:
+        query = query.filter(Transaction.account_id == account_id)
+    if category:
+        query = query.filter(Transaction.category == category)
+    if start_date:
+        query = query.filter(Transaction.date >= start_date)
+    if end_date:
+        query = query.filter(Transaction.date <= end_date)
+    return query
+
+@router.get("/", response_model=Union[List[TransactionResponse], TransactionPage])
 def list_transactions(
     account_id: Optional[int] = None,
     category: Optional[str] = None,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
-    limit: int = Query(100, le=500),
+    limit: int = Query(100, ge=1, le=500),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(
+        None, description="Keyset pagination: send it empty for the first page, then each next_cursor"
+    ),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-   
+    
     query = db.query(Transaction).join(Account).filter(Account.user_id == current_user.id)
+    query = _apply_filters(query, account_id, category, start_date, end_date)
     
-    if account_id:
-        query = query.filter(Transaction.account_id == account_id)
-    if category:
-        query = query.filter(Transaction.category == category)
-    if start_date:
-        query = query.filter(Transaction.date >= start_date)
-    if end_date:
-        query = query.filter(Transaction.date <= end_date)
+    query = query.order_by(Transaction.date.desc(), Transaction.id.desc())
+    if cursor is None:
+        return query.offset(offset).limit(limit).all()
+    
+    # Seek past the last row seen instead of counting rows to skip, so deep pages cost the
+    # same as the first and rows inserted by a running sync don't shift the page boundaries
+    if cursor:
+        try:
+            last_date, last_id = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.filter(tuple_(Transaction.date, Transaction.id) < (last_date, last_id))
+    
+    transactions = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(transactions) > limit:
+        transactions = transactions[:limit]
+        next_cursor = encode_cursor(transactions[-1].date, transactions[-1].id)
+    return {"items": transactions, "next_cursor": next_cursor}
+
+def _export_chunks(db: Session, stmt, format: str) -> Iterator[str]:
+    """Encode rows one yield_per batch at a time, so memory stays flat however many rows match"""
+    try:
+        result = db.execute(stmt.execution_options(yield_per=settings.EXPORT_BATCH_SIZE))
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if format == "csv":
+            writer.writerow(EXPORT_FIELDS)
+        
+        for rows in result.partitions():
+            for row in rows:
+                values = [v.isoformat() if isinstance(v, datetime) else v for v in row]
+                if format == "csv":
+                    writer.writerow(values)
+                else:
+                    buffer.write(json.dumps(dict(zip(EXPORT_FIELDS, values))))
+                    buffer.write("\n")
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        
+        if format == "csv" and buffer.tell():
+            yield buffer.getvalue()  # header only, nothing matched
+    finally:
+        # get_db has already closed the session by the time the body streams; the reads
+        # above reopened it, so release that connection here
+        db.close()
+
+@router.get("/export")
+def export_transactions(
+    account_id: Optional[int] = None,
+    category: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    stmt = select(*EXPORT_COLUMNS).join(Account, Account.id == Transaction.account_id).filter(
+        Account.user_id == current_user.id
+    )
+    stmt = _apply_filters(stmt, account_id, category, start_date, end_date)
+    stmt = stmt.order_by(Transaction.date.desc(), Transaction.id.desc())
     
-    transactions = query.order_by(Transaction.date.desc()).offset(offset).limit(limit).all()
-    return transactions
+    return StreamingResponse(
+        _export_chunks(db, stmt, format),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="transactions.{format}"'}
+    )
 
 @router.get("/{transaction_id}", response_model=TransactionResponse)
 def get_transaction(
@@ -77,7 +177,7 @@ def reconcile_transaction(
         db, transaction_id, reconcile_data, current_user.id
     )
     
-    cache.invalidate_pattern(f"account:{transaction.account_id}:*")
+    cache.invalidate_tags(f"account:{transaction.account_id}")
     
     return updated
 
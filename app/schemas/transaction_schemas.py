@@ -1,6 +1,6 @@
 from pydantic import BaseModel, ConfigDict
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 class TransactionBase(BaseModel):
     date: datetime
@@ -24,6 +24,10 @@ class TransactionResponse(TransactionBase):
     
     model_config = ConfigDict(from_attributes=True)
 
+class TransactionPage(BaseModel):
+    items: List[TransactionResponse]
+    next_cursor: Optional[str] = None
+
 class TransactionReconcile(BaseModel):
     amount: Optional[float] = None
     description: Optional[str] = None
@@ -0,0 +1,76 @@
+import redis.asyncio as aioredis
+from app.config import get_settings
+from app.services.alert_service import ALERT_STREAM
+from collections import defaultdict
+from typing import Dict, Optional, Set
+import asyncio
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+class AlertBroadcaster:
+    """One shared Redis stream reader per process, fanned out to per-connection queues"""
+    
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = defaultdict(set)
+        self._task: Optional[asyncio.Task] = None
+    
+    def subscribe(self, user_id: int) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers[user_id].add(queue)
+        
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return queue
+    
+    def unsubscribe(self, user_id: int, queue: asyncio.Queue):
+        queues = self._subscribers.get(user_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[user_id]
+        
+        if not self._subscribers and self._task is not None:
+            self._task.cancel()
+            self._task = None
+    
+    def connection_count(self) -> int:
+        return sum(len(queues) for queues in self._subscribers.values())
+    
+    def dispatch(self, alert: dict):
+        for queue in self._subscribers.get(alert.get("user_id"), ()):
+            if queue.full():
+                # A slow client loses its oldest alert rather than stalling everyone else
+                queue.get_nowait()
+            queue.put_nowait(alert)
+    
+    async def _run(self):
+        client = aioredis.from_url(settings.REDIS_URL, decode_responses=True)
+        last_id = "$"
+        try:
+            while self._subscribers:
+                try:
+                    result = await client.xread(
+                        {ALERT_STREAM: last_id},
+                        count=settings.ALERT_CONSUMER_BATCH_SIZE,
+                        block=settings.ALERT_CONSUMER_BLOCK_MS
+                    )
+                except Exception as e:
+                    logger.error(f"Alert broadcast read error: {e}")
+                    await asyncio.sleep(settings.ALERT_CONSUMER_BLOCK_MS / 1000)
+                    continue
+                
+                for _, messages in result or []:
+                    for message_id, fields in messages:
+                        last_id = message_id
+                        try:
+                            self.dispatch(json.loads(fields["data"]))
+                        except Exception as e:
+                            logger.error(f"Alert broadcast dispatch error: {e}")
+        finally:
+            await client.aclose()
+
+alert_broadcaster = AlertBroadcaster()
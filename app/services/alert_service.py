@@ -1,34 +1,52 @@
 from app.cache import cache
 from app.models.budget import Budget
 from datetime import datetime, timezone
+from typing import List
 import logging
 
 logger = logging.getLogger(__name__)
 
+ALERT_STREAM = "alerts:stream"
+
 class AlertService:
+    @staticmethod
+    def build_budget_alert(user_id: int, category: str, budget: Budget, alert_type: str) -> dict:
+        percentage = (budget.current_spend / budget.amount) * 100
+        
+        return {
+            "type": "budget_alert",
+            "alert_type": alert_type,  
+            "user_id": user_id,
+            "category": category,
+            "budget_amount": budget.amount,
+            "current_spend": budget.current_spend,
+            "percentage": round(percentage, 2),
+            "remaining": budget.amount - budget.current_spend,
+            "timestamp": datetime.now(timezone.utc).isoformat()
+        }
+    
     @staticmethod
     def send_budget_alert(user_id: int, category: str, budget: Budget, alert_type: str):
         try:
-            percentage = (budget.current_spend / budget.amount) * 100
+            alert_data = AlertService.build_budget_alert(user_id, category, budget, alert_type)
             
-            alert_data = {
-                "type": "budget_alert",
-                "alert_type": alert_type,  
-                "user_id": user_id,
-                "category": category,
-                "budget_amount": budget.amount,
-                "current_spend": budget.current_spend,
-                "percentage": round(percentage, 2),
-                "remaining": budget.amount - budget.current_spend,
-                "timestamp": datetime.now(timezone.utc).isoformat()
-            }
-            
-            cache.publish("alerts", alert_data)
+            cache.stream_add(ALERT_STREAM, [alert_data])
             logger.info(f"Budget alert sent for user {user_id}, category {category}")
             
         except Exception as e:
             logger.error(f"Alert sending error: {e}")
     
+    @staticmethod
+    def send_budget_alerts(alerts: List[dict], pipe=None):
+        """Publish a batch of prepared budget alerts in one round trip, or queue them on `pipe`"""
+        if not alerts:
+            return
+        try:
+            cache.stream_add(ALERT_STREAM, alerts, pipe=pipe)
+            logger.info(f"Sent {len(alerts)} budget alerts")
+        except Exception as e:
+            logger.error(f"Alert sending error: {e}")
+    
     @staticmethod
     def send_anomaly_alert(user_id: int, transaction_id: int, anomaly: dict):
         try:
@@ -42,7 +60,7 @@ class AlertService:
                 "timestamp": datetime.now(timezone.utc).isoformat()
             }
             
-            cache.publish("alerts", alert_data)
+            cache.stream_add(ALERT_STREAM, [alert_data])
             logger.info(f"Anomaly alert sent for transaction {transaction_id}")
             
         except Exception as e:
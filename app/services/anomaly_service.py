@@ -1,84 +1,199 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import insert
 from app.models.transaction import Transaction
+from app.models.anomaly import Anomaly
+from app.services.category_stats_service import CategoryStatsService
+from app.services.merchant_history_service import MerchantHistoryService
 from datetime import datetime, timedelta, timezone
-from typing import List, Dict
-import statistics
+from typing import List, Dict, Any, Tuple
+import numpy as np
 import logging
 
 logger = logging.getLogger(__name__)
 
 class AnomalyService:
+    # Welford leaves float residue in M2 for constant series
+    MIN_STDEV = 1e-9
+    MIN_HISTORY = 10
+    
     @staticmethod
-    def detect_anomalies(db: Session, account_id: int, days_lookback: int = 90) -> List[Dict]:
-        anomalies = []
+    def load_columns(db: Session, account_ids: List[int], since: datetime) -> Dict[str, Any]:
+        """Narrow SELECT of recent rows as column arrays, no ORM objects"""
+        rows = db.query(
+            Transaction.id,
+            Transaction.account_id,
+            Transaction.date,
+            Transaction.category,
+            Transaction.amount,
+            Transaction.merchant
+        ).filter(
+            Transaction.account_id.in_(account_ids),
+            Transaction.date >= since
+        ).order_by(Transaction.account_id, Transaction.id).all()
+        
+        ids, row_account_ids, dates, categories, amounts, merchants = \
+            zip(*rows) if rows else ((), (), (), (), (), ())
+        return {
+            "id": np.array(ids, dtype=np.int64),
+            "account_id": list(row_account_ids),
+            "date": list(dates),
+            "category": list(categories),
+            "amount": np.abs(np.array(amounts, dtype=np.float64)),
+            "merchant": list(merchants)
+        }
+    
+    @staticmethod
+    def score_amounts(columns: Dict[str, Any], stats_by_account: Dict[int, Dict[str, Any]]) -> np.ndarray:
+        """z-score every row against its (account, category) baseline; NaN where none is usable"""
+        codes: Dict[Tuple[int, str], int] = {}
+        inverse = np.fromiter(
+            (
+                codes.setdefault(key, len(codes))
+                for key in zip(columns["account_id"], columns["category"])
+            ),
+            dtype=np.int64,
+            count=len(columns["category"])
+        )
+        
+        means = np.full(len(codes), np.nan)
+        stdevs = np.full(len(codes), np.nan)
+        for (account_id, category), code in codes.items():
+            stats = stats_by_account.get(account_id, {}).get(category)
+            if stats is None or stats.count < 5:
+                continue
+            stdev = CategoryStatsService.stdev(stats)
+            if stdev and stdev >= AnomalyService.MIN_STDEV:
+                means[code] = stats.mean
+                stdevs[code] = stdev
+        
+        return (columns["amount"] - means[inverse]) / stdevs[inverse]
+    
+    @staticmethod
+    def score_accounts(
+        db: Session,
+        account_ids: List[int]
+    ) -> Tuple[Dict[int, List[Dict]], List[int]]:
+        """Score a chunk of accounts with a fixed number of set-based queries"""
+        stats_by_account = CategoryStatsService.get_stats_many(db, account_ids)
+        missing = [account_id for account_id in account_ids if account_id not in stats_by_account]
+        if missing:
+            stats_by_account.update(CategoryStatsService.rebuild_many(db, missing))
+        
+        eligible = {
+            account_id for account_id, stats in stats_by_account.items()
+            if sum(s.count for s in stats.values()) >= AnomalyService.MIN_HISTORY
+        }
+        results: Dict[int, List[Dict]] = {account_id: [] for account_id in account_ids}
+        if not eligible:
+            return results, []
+        
+        recent_cutoff = datetime.now(timezone.utc) - timedelta(days=7)
+        recent = AnomalyService.load_columns(db, sorted(eligible), recent_cutoff)
+        
+        z_scores = AnomalyService.score_amounts(recent, stats_by_account)
+        abs_z = np.abs(z_scores)
+        flagged = np.flatnonzero(np.nan_to_num(abs_z, nan=0.0) > 2)
+        
+        for i in flagged:
+            account_id = recent["account_id"][i]
+            amount = recent["amount"][i]
+            category = recent["category"][i]
+            mean = stats_by_account[account_id][category].mean
+            results[account_id].append({
+                "transaction_id": int(recent["id"][i]),
+                "type": "unusual_amount",
+                "description": f"${amount:.2f} is {abs_z[i]:.1f}σ from normal ${mean:.2f} for {category}",
+                "severity": "high" if abs_z[i] > 3 else "medium",
+                "z_score": float(z_scores[i]),
+                "date": recent["date"][i].isoformat()
+            })
         
+        # A merchant is new if the account never saw it before the recent window
+        MerchantHistoryService.ensure_indexed(db, sorted(eligible))
+        merchant_keys = [MerchantHistoryService.normalize(m) for m in recent["merchant"]]
+        first_seen = MerchantHistoryService.lookup(db, sorted(eligible), merchant_keys)
+        
+        for i, key in enumerate(merchant_keys):
+            account_id = recent["account_id"][i]
+            seen_date = first_seen.get((account_id, key))
+            if key and (seen_date is None or seen_date >= recent_cutoff):
+                merchant = recent["merchant"][i]
+                results[account_id].append({
+                    "transaction_id": int(recent["id"][i]),
+                    "type": "new_merchant",
+                    "description": f"First transaction with merchant: {merchant}",
+                    "severity": "low",
+                    "date": recent["date"][i].isoformat()
+                })
+        
+        return results, recent["id"][flagged].tolist()
+    
+    @staticmethod
+    def sweep_accounts(db: Session, account_ids: List[int]) -> Dict[int, List[Dict]]:
+        """Score a chunk, replace its stored anomalies and bulk-flag outliers in one commit"""
+        results, flagged_ids = AnomalyService.score_accounts(db, account_ids)
+        
+        if flagged_ids:
+            db.query(Transaction).filter(
+                Transaction.id.in_(flagged_ids)
+            ).update({Transaction.is_anomaly: True}, synchronize_session=False)
+        
+        db.query(Anomaly).filter(
+            Anomaly.account_id.in_(account_ids)
+        ).delete(synchronize_session=False)
+        
+        detected_at = datetime.now(timezone.utc)
+        rows = [
+            {
+                "account_id": account_id,
+                "transaction_id": anomaly["transaction_id"],
+                "type": anomaly["type"],
+                "severity": anomaly["severity"],
+                "description": anomaly["description"],
+                "z_score": anomaly.get("z_score"),
+                "date": datetime.fromisoformat(anomaly["date"]),
+                "detected_at": detected_at
+            }
+            for account_id, anomalies in results.items()
+            for anomaly in anomalies
+        ]
+        if rows:
+            db.execute(insert(Anomaly), rows)
+        
+        db.commit()
+        return results
+    
+    @staticmethod
+    def detect_anomalies(db: Session, account_id: int, days_lookback: int = 90) -> List[Dict]:
         try:
+            anomalies = AnomalyService.sweep_accounts(db, [account_id])[account_id]
             cutoff_date = datetime.now(timezone.utc) - timedelta(days=days_lookback)
-            transactions = db.query(Transaction).filter(
-                Transaction.account_id == account_id,
-                Transaction.date >= cutoff_date
-            ).all()
-            
-            if len(transactions) < 10:
-                return []  
-            
-            category_amounts = {}
-            for txn in transactions:
-                if txn.category not in category_amounts:
-                    category_amounts[txn.category] = []
-                category_amounts[txn.category].append(abs(txn.amount))
-            
-            recent_cutoff = datetime.now(timezone.utc) - timedelta(days=7)
-            recent_txns = [t for t in transactions if t.date >= recent_cutoff]
-            
-            for txn in recent_txns:
-                category = txn.category
-                amount = abs(txn.amount)
-                
-                if category not in category_amounts or len(category_amounts[category]) < 5:
-                    continue
-                
-                historical = category_amounts[category]
-                mean = statistics.mean(historical)
-                
-                try:
-                    stdev = statistics.stdev(historical)
-                except:
-                    continue
-                
-                if stdev == 0:
-                    continue
-                
-                z_score = (amount - mean) / stdev
-                
-                if abs(z_score) > 2:
-                    severity = "high" if abs(z_score) > 3 else "medium"
-                    anomalies.append({
-                        "transaction_id": txn.id,
-                        "type": "unusual_amount",
-                        "description": f"${amount:.2f} is {abs(z_score):.1f}σ from normal ${mean:.2f} for {category}",
-                        "severity": severity,
-                        "z_score": z_score,
-                        "date": txn.date.isoformat()
-                    })
-                    
-                    txn.is_anomaly = True
-            
-            merchant_history = set([t.merchant for t in transactions if t.date < recent_cutoff])
-            for txn in recent_txns:
-                if txn.merchant and txn.merchant not in merchant_history:
-                    anomalies.append({
-                        "transaction_id": txn.id,
-                        "type": "new_merchant",
-                        "description": f"First transaction with merchant: {txn.merchant}",
-                        "severity": "low",
-                        "date": txn.date.isoformat()
-                    })
-            
-            db.commit()
-            
+            return [a for a in anomalies if datetime.fromisoformat(a["date"]) >= cutoff_date]
         except Exception as e:
             logger.error(f"Anomaly detection error: {e}")
+            db.rollback()
+            return []
+    
+    @staticmethod
+    def get_anomalies(db: Session, account_id: int, days_lookback: int = 90) -> List[Dict]:
+        """Read the anomalies stored by the last sweep"""
+        cutoff_date = datetime.now(timezone.utc) - timedelta(days=days_lookback)
+        rows = db.query(Anomaly).filter(
+            Anomaly.account_id == account_id,
+            Anomaly.date >= cutoff_date
+        ).order_by(Anomaly.id).all()
         
-        return anomalies
\ No newline at end of file
+        anomalies = []
+        for row in rows:
+            anomaly = {
+                "transaction_id": row.transaction_id,
+                "type": row.type,
+                "description": row.description,
+                "severity": row.severity,
+                "date": row.date.isoformat(),
+                "detected_at": row.detected_at.isoformat()
+            }
+            if row.z_score is not None:
+                anomaly["z_score"] = row.z_score
+            anomalies.append(anomaly)
+        return anomalies
@@ -0,0 +1,122 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from app.models.account import Account
+from app.models.budget import Budget, BudgetPeriod
+from app.models.transaction import Transaction
+from app.cache import cache
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+class BudgetLedgerService:
+    """Budget spend recomputed from the transaction ledger for calendar periods"""
+    
+    @staticmethod
+    def period_bounds(period: BudgetPeriod, at: Optional[datetime] = None) -> Tuple[datetime, datetime]:
+        """[start, end) of the calendar week (Monday) or month containing `at`, in UTC"""
+        at = at or datetime.now(timezone.utc)
+        if at.tzinfo is None:
+            at = at.replace(tzinfo=timezone.utc)
+        day = at.astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        
+        if period == BudgetPeriod.WEEKLY:
+            start = day - timedelta(days=day.weekday())
+            return start, start + timedelta(days=7)
+        
+        start = day.replace(day=1)
+        if start.month == 12:
+            return start, start.replace(year=start.year + 1, month=1)
+        return start, start.replace(month=start.month + 1)
+    
+    @staticmethod
+    def _cache_key(user_id: int, period: BudgetPeriod, start: datetime) -> str:
+        # Tagged with user:{id} so sync's user-wide invalidation also drops it
+        return f"user:{user_id}:budget_spend:{period.value}:{start.date().isoformat()}"
+    
+    @staticmethod
+    def compute_period_spend(
+        db: Session,
+        user_id: int,
+        period: BudgetPeriod,
+        at: Optional[datetime] = None
+    ) -> Dict[str, float]:
+        """Uncached spend per budgeted category for the calendar period containing `at`"""
+        start, end = BudgetLedgerService.period_bounds(period, at)
+        categories = [
+            category for (category,) in db.query(Budget.category_name).filter(
+                Budget.user_id == user_id,
+                Budget.period == period
+            ).distinct()
+        ]
+        
+        spend = {category: 0.0 for category in categories}
+        if categories:
+            # category IN (...) plus the date range is served by idx_category_date
+            rows = db.query(
+                Transaction.category,
+                func.sum(-Transaction.amount)
+            ).join(Account, Account.id == Transaction.account_id).filter(
+                Account.user_id == user_id,
+                Transaction.category.in_(categories),
+                Transaction.date >= start,
+                Transaction.date < end,
+                Transaction.amount < 0
+            ).group_by(Transaction.category)
+            
+            for category, total in rows:
+                spend[category] = round(total or 0.0, 2)
+        return spend
+    
+    @staticmethod
+    def get_period_spend(
+        db: Session,
+        user_id: int,
+        period: BudgetPeriod,
+        at: Optional[datetime] = None
+    ) -> Dict[str, float]:
+        """Spend per budgeted category for the calendar period containing `at`"""
+        start, _ = BudgetLedgerService.period_bounds(period, at)
+        return cache.get_or_compute(
+            BudgetLedgerService._cache_key(user_id, period, start),
+            lambda: BudgetLedgerService.compute_period_spend(db, user_id, period, start),
+            tags=[f"user:{user_id}", f"user:{user_id}:budget_spend"]
+        )
+    
+    @staticmethod
+    def get_report(db: Session, user_id: int, at: Optional[datetime] = None) -> List[dict]:
+        budgets = db.query(Budget).filter(Budget.user_id == user_id).order_by(Budget.id).all()
+        spend_by_period = {
+            period: BudgetLedgerService.get_period_spend(db, user_id, period, at)
+            for period in {b.period for b in budgets}
+        }
+        
+        report = []
+        for b in budgets:
+            start, end = BudgetLedgerService.period_bounds(b.period, at)
+            spent = spend_by_period[b.period].get(b.category_name, 0.0)
+            report.append({
+                "id": b.id,
+                "category_name": b.category_name,
+                "amount": b.amount,
+                "period": b.period.value,
+                "period_start": start.isoformat(),
+                "period_end": end.isoformat(),
+                "spent": spent,
+                "remaining": round(b.amount - spent, 2),
+                "percentage_used": round(spent / b.amount * 100, 2) if b.amount > 0 else 0
+            })
+        return report
+    
+    @staticmethod
+    def invalidate(user_id: int, at: datetime):
+        """Drop the cached weekly and monthly periods that contain `at`"""
+        cache.delete_many([
+            BudgetLedgerService._cache_key(user_id, period, BudgetLedgerService.period_bounds(period, at)[0])
+            for period in BudgetPeriod
+        ])
+    
+    @staticmethod
+    def invalidate_user(user_id: int):
+        cache.invalidate_tags(f"user:{user_id}:budget_spend")
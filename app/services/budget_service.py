@@ -1,8 +1,10 @@
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 from app.models.budget import Budget, BudgetPeriod
 from app.services.alert_service import AlertService
+from app.services.budget_ledger_service import BudgetLedgerService
 from datetime import datetime, timedelta, timezone
-from typing import List
+from typing import List, Iterable, Optional, Set, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
@@ -15,56 +17,199 @@ class BudgetService:
             category_name=category_name,
             amount=amount,
             period=BudgetPeriod(period),
-            period_start=datetime.now(timezone.utc)
+            period_start=BudgetLedgerService.period_bounds(BudgetPeriod(period))[0]
         )
         db.add(budget)
         db.commit()
+        
+        # Start from what the ledger already holds for this period, so current_spend and
+        # /budgets/spend agree from the first day
+        spent = BudgetLedgerService.compute_period_spend(db, user_id, budget.period).get(category_name, 0.0)
+        if spent:
+            db.execute(
+                update(Budget).where(Budget.id == budget.id).values(current_spend=Budget.current_spend + spent),
+                execution_options={"synchronize_session": False}
+            )
+            db.commit()
         db.refresh(budget)
+        BudgetLedgerService.invalidate_user(user_id)
         return budget
     
     @staticmethod
     def update_budget_spending(db: Session, user_id: int, category: str, transaction_amount: float):
+        touched = BudgetService.apply_spending_batch(
+            db, user_id, [{"category": category, "amount": transaction_amount}]
+        )
+        BudgetService.evaluate_thresholds(db, user_id, touched)
+    
+    @staticmethod
+    def apply_spending_batch(db: Session, user_id: int, rows: Iterable[dict]) -> Set[str]:
+        """Fold a batch of transactions into budget spend with one atomic UPDATE per budget.
+        
+        Like the ledger, a row only counts toward a budget's current period when its date
+        falls inside it; rows without a date count as current. Returns the budgeted
+        categories that changed; thresholds are left to evaluate_thresholds.
+        """
         try:
-            budget = db.query(Budget).filter(
-                Budget.user_id == user_id,
-                Budget.category_name == category
-            ).first()
-            
-            if not budget:
-                return
-            
+            return BudgetService._apply_spend_deltas(db, user_id, [
+                (row["category"], abs(row["amount"]), row.get("date"))
+                for row in rows if row["amount"] < 0 and row.get("category")
+            ])
+        except Exception as e:
+            logger.error(f"Budget update error: {e}")
+            db.rollback()
+            return set()
+    
+    @staticmethod
+    def apply_reconciliation(
+        db: Session,
+        user_id: int,
+        date: datetime,
+        old_category: Optional[str],
+        old_amount: float,
+        new_category: Optional[str],
+        new_amount: float
+    ) -> List[dict]:
+        """Move a corrected transaction's spend between budgets and recheck their thresholds"""
+        touched = BudgetService.apply_corrections_batch(db, user_id, [{
+            "date": date,
+            "old_category": old_category,
+            "old_amount": old_amount,
+            "new_category": new_category,
+            "new_amount": new_amount
+        }])
+        return BudgetService.evaluate_thresholds(db, user_id, touched)
+    
+    @staticmethod
+    def apply_corrections_batch(db: Session, user_id: int, corrections: Iterable[dict]) -> Set[str]:
+        """Move the spend of corrected transactions between budgets in one pass.
+        
+        Each correction carries date, old_category/old_amount and new_category/new_amount.
+        Returns the budgeted categories that changed; thresholds are left to evaluate_thresholds.
+        """
+        entries = []
+        for correction in corrections:
+            if correction["old_amount"] < 0 and correction["old_category"]:
+                entries.append((correction["old_category"], correction["old_amount"], correction["date"]))
+            if correction["new_amount"] < 0 and correction["new_category"]:
+                entries.append((correction["new_category"], abs(correction["new_amount"]), correction["date"]))
+        try:
+            return BudgetService._apply_spend_deltas(db, user_id, entries)
+        except Exception as e:
+            logger.error(f"Budget reconciliation error: {e}")
+            db.rollback()
+            return set()
+    
+    @staticmethod
+    def _apply_spend_deltas(
+        db: Session,
+        user_id: int,
+        entries: List[Tuple[str, float, Optional[datetime]]]
+    ) -> Set[str]:
+        if not entries:
+            return set()
+        
+        budgets = db.query(Budget).filter(
+            Budget.user_id == user_id,
+            Budget.category_name.in_({category for category, _, _ in entries})
+        ).all()
+        if not budgets:
+            return set()
+        
+        touched = set()
+        for budget in budgets:
             BudgetService.reset_budget_if_needed(db, budget)
+            start, end = BudgetLedgerService.period_bounds(budget.period)
+            delta = sum(
+                amount for category, amount, date in entries
+                if category == budget.category_name
+                and (date is None or start <= BudgetService._as_utc(date) < end)
+            )
+            if not delta:
+                continue
             
-            if transaction_amount < 0:
-                budget.current_spend += abs(transaction_amount)
-                db.commit()
-                
+            # Increment in SQL so concurrent syncs for the same user can't lose updates
+            db.execute(
+                update(Budget).where(Budget.id == budget.id).values(
+                    current_spend=Budget.current_spend + delta
+                ),
+                execution_options={"synchronize_session": False}
+            )
+            touched.add(budget.category_name)
+        db.commit()
+        return touched
+    
+    @staticmethod
+    def _as_utc(value: datetime) -> datetime:
+        return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+    
+    @staticmethod
+    def evaluate_thresholds(db: Session, user_id: int, categories: Iterable[str], pipe=None) -> List[dict]:
+        """Check a user's budgets once per batch and publish at most one alert per level per period.
+        
+        Pass a `cache.pipeline()` as `pipe` to send the alerts with the caller's other Redis writes.
+        """
+        categories = list(categories)
+        if not categories:
+            return []
+        
+        try:
+            budgets = db.query(Budget).filter(
+                Budget.user_id == user_id,
+                Budget.category_name.in_(categories)
+            ).populate_existing().all()
+            
+            alerts = []
+            for budget in budgets:
                 percentage = (budget.current_spend / budget.amount) * 100
                 if percentage >= 100 and not budget.alert_sent:
-                    AlertService.send_budget_alert(user_id, category, budget, "exceeded")
-                    budget.alert_sent = True
-                    db.commit()
-                elif percentage >= 80 and percentage < 100 and not budget.alert_sent:
-                    AlertService.send_budget_alert(user_id, category, budget, "warning")
+                    alert_type, flag = "exceeded", Budget.alert_sent
+                elif percentage >= 80 and not budget.alert_sent and not budget.warning_sent:
+                    alert_type, flag = "warning", Budget.warning_sent
+                else:
+                    continue
+                
+                # Claim the alert in SQL so a concurrent sync can't send it twice
+                values = {flag: True}
+                if alert_type == "exceeded":
+                    values[Budget.warning_sent] = True
+                claimed = db.execute(
+                    update(Budget).where(Budget.id == budget.id, flag.isnot(True)).values(values),
+                    execution_options={"synchronize_session": False}
+                ).rowcount
+                if claimed:
+                    alerts.append(AlertService.build_budget_alert(
+                        user_id, budget.category_name, budget, alert_type
+                    ))
+            
+            db.commit()
+            AlertService.send_budget_alerts(alerts, pipe=pipe)
+            return alerts
         except Exception as e:
-            logger.error(f"Budget update error: {e}")
+            logger.error(f"Budget threshold error: {e}")
             db.rollback()
+            return []
     
     @staticmethod
     def reset_budget_if_needed(db: Session, budget: Budget):
-        now = datetime.now(timezone.utc)
-        days_elapsed = (now - budget.period_start).days
-        
-        should_reset = False
-        if budget.period == BudgetPeriod.WEEKLY and days_elapsed >= 7:
-            should_reset = True
-        elif budget.period == BudgetPeriod.MONTHLY and days_elapsed >= 30:
-            should_reset = True
+        # Periods are calendar weeks/months, so period_start never drifts
+        period_start, _ = BudgetLedgerService.period_bounds(budget.period)
         
-        if should_reset:
-            budget.current_spend = 0.0
-            budget.alert_sent = False
-            budget.period_start = now
+        if budget.period_start < period_start:
+            # Conditional so only one concurrent sync resets, and never after another
+            # sync has already added new-period spend
+            db.execute(
+                update(Budget).where(
+                    Budget.id == budget.id,
+                    Budget.period_start < period_start
+                ).values(
+                    current_spend=0.0,
+                    alert_sent=False,
+                    warning_sent=False,
+                    period_start=period_start
+                ),
+                execution_options={"synchronize_session": False}
+            )
             db.commit()
     
     @staticmethod
@@ -1,11 +1,20 @@
 import re
-from typing import Optional
+import time
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from typing import Optional, Tuple, List
+from app.models.category import Category
+from app.cache import cache
+from app.core.aho_corasick import AhoCorasick
+from app.core.lru_cache import LRUCache
+from app.config import get_settings
 import logging
 
 logger = logging.getLogger(__name__)
+settings = get_settings()
 
 class CategorizationService:
-    RULES = {
+    DEFAULT_RULES = {
         "groceries": {
             "keywords": ["grocery", "supermarket", "whole foods", "trader joe", "safeway", "kroger"],
             "merchants": ["walmart", "target", "costco", "albertsons"]
@@ -39,38 +48,197 @@ class CategorizationService:
             "amount_threshold": 500
         }
     }
+    RULES = DEFAULT_RULES
+    
+    RULES_VERSION_KEY = "categories:rules_version"
+    
+    INCOME_PRIORITY = -1
+    KEYWORD = "keyword"
+    MERCHANT = "merchant"
+    
+    # (rules dict compiled from, automaton, categories in priority order)
+    _compiled: Optional[Tuple[dict, AhoCorasick, List[str]]] = None
+    _memo = LRUCache(maxsize=settings.CATEGORY_CACHE_SIZE)
+    # (Redis version counter, categories table stamp) the compiled rules were loaded at
+    _rules_version: Optional[tuple] = None
+    _rules_loaded = False
+    _rules_checked_at = 0.0
+    
+    @staticmethod
+    def compile_rules(rules: Optional[dict] = None) -> AhoCorasick:
+        """Rebuild the matcher; call after replacing or editing RULES"""
+        if rules is not None:
+            CategorizationService.RULES = rules
+        rules = CategorizationService.RULES
+        
+        categories = [category for category in rules if category != "income"]
+        patterns = []
+        for priority, category in enumerate(categories):
+            for keyword in rules[category].get("keywords", []):
+                patterns.append((keyword, (priority, CategorizationService.KEYWORD)))
+            for merchant_pattern in rules[category].get("merchants", []):
+                patterns.append((merchant_pattern, (priority, CategorizationService.MERCHANT)))
+        
+        for keyword in rules.get("income", {}).get("keywords", []):
+            patterns.append((keyword, (CategorizationService.INCOME_PRIORITY, CategorizationService.KEYWORD)))
+        
+        matcher = AhoCorasick(patterns)
+        CategorizationService._compiled = (rules, matcher, categories)
+        CategorizationService._memo.clear()
+        return matcher
+    
+    @staticmethod
+    def _get_compiled() -> Tuple[dict, AhoCorasick, List[str]]:
+        compiled = CategorizationService._compiled
+        if compiled is None or compiled[0] is not CategorizationService.RULES:
+            CategorizationService.compile_rules()
+            compiled = CategorizationService._compiled
+        return compiled
+    
+    @staticmethod
+    def load_rules_from_db(db: Session) -> Optional[dict]:
+        """Merge category rows over DEFAULT_RULES; None when no row has any terms.
+        
+        A row's keywords or merchants replace that category's built-in list; categories
+        without rows keep their built-in rules, and new categories follow them in id order.
+        """
+        rows = db.query(Category.name, Category.keywords, Category.merchants).order_by(Category.id).all()
+        
+        overrides = {}
+        for name, keywords, merchants in rows:
+            keyword_list = CategorizationService._split_terms(keywords)
+            merchant_list = CategorizationService._split_terms(merchants)
+            if keyword_list or merchant_list:
+                overrides[name] = (keyword_list, merchant_list)
+        
+        if not overrides:
+            return None
+        
+        rules = {name: dict(category_rules) for name, category_rules in CategorizationService.DEFAULT_RULES.items()}
+        income = rules.pop("income")
+        for name, (keyword_list, merchant_list) in overrides.items():
+            category_rules = income if name == "income" else rules.setdefault(name, {})
+            if keyword_list:
+                category_rules["keywords"] = keyword_list
+            if merchant_list and name != "income":
+                category_rules["merchants"] = merchant_list
+        rules["income"] = income
+        return rules
+    
+    @staticmethod
+    def refresh_rules(db: Session, force: bool = False) -> bool:
+        """Reload rules when the categories table or the Redis version stamp moved.
+        
+        Returns True if recompiled. Rows changed through the ORM are picked up on the next
+        check (every CATEGORY_RULES_REFRESH_SECONDS); bump_rules_version covers raw SQL edits.
+        """
+        now = time.monotonic()
+        if not force and CategorizationService._rules_loaded and \
+                now - CategorizationService._rules_checked_at < settings.CATEGORY_RULES_REFRESH_SECONDS:
+            return False
+        CategorizationService._rules_checked_at = now
+        
+        try:
+            version = (cache.get(CategorizationService.RULES_VERSION_KEY), CategorizationService._rules_stamp(db))
+            if not force and CategorizationService._rules_loaded and \
+                    version == CategorizationService._rules_version:
+                return False
+            
+            rules = CategorizationService.load_rules_from_db(db)
+        except Exception as e:
+            logger.error(f"Category rules load error: {e}")
+            return False
+        
+        CategorizationService.compile_rules(rules or CategorizationService.DEFAULT_RULES)
+        CategorizationService._rules_version = version
+        CategorizationService._rules_loaded = True
+        logger.info(f"Category rules loaded ({'database' if rules else 'built-in'}, version {version})")
+        return True
+    
+    @staticmethod
+    def _rules_stamp(db: Session) -> tuple:
+        """Row count, highest id and latest updated_at: moves on any insert, delete or ORM edit"""
+        return tuple(db.query(
+            func.count(Category.id), func.max(Category.id), func.max(Category.updated_at)
+        ).one())
+    
+    @staticmethod
+    def bump_rules_version():
+        """Signal every process to reload rules on its next refresh check"""
+        cache.incr(CategorizationService.RULES_VERSION_KEY)
+    
+    @staticmethod
+    def _split_terms(value: Optional[str]) -> List[str]:
+        if not value:
+            return []
+        return [term.strip().lower() for term in value.split(",") if term.strip()]
     
     @staticmethod
     def categorize(description: str, merchant: Optional[str], amount: float) -> str:
         """Categorize transaction based on rules"""
         try:
+            rules, matcher, categories = CategorizationService._get_compiled()
             desc_lower = description.lower()
             merchant_lower = (merchant or "").lower()
             
-            if amount > 0:
-                for keyword in CategorizationService.RULES["income"]["keywords"]:
-                    if keyword in desc_lower:
-                        return "income"
-                if amount >= CategorizationService.RULES["income"]["amount_threshold"]:
-                    return "income"
-            
-            for category, rules in CategorizationService.RULES.items():
-                if category == "income":
-                    continue
-                
-                for keyword in rules.get("keywords", []):
-                    if keyword in desc_lower or keyword in merchant_lower:
-                        return category
-                
-                for merchant_pattern in rules.get("merchants", []):
-                    if merchant_pattern in merchant_lower:
-                        return category
-            
-            return "other"
+            key = (desc_lower, merchant_lower, CategorizationService._amount_bucket(rules, amount))
+            category = CategorizationService._memo.get(key)
+            if category is None:
+                category = CategorizationService._match(
+                    rules, matcher, categories, desc_lower, merchant_lower, amount
+                )
+                CategorizationService._memo.set(key, category)
+            return category
         except Exception as e:
             logger.error(f"Categorization error: {e}")
             return "other"
     
+    @staticmethod
+    def _amount_bucket(rules: dict, amount: float) -> int:
+        """Amount only matters as debit, small credit or credit above the income threshold"""
+        if amount <= 0:
+            return 0
+        threshold = rules.get("income", {}).get("amount_threshold")
+        if threshold is not None and amount >= threshold:
+            return 2
+        return 1
+    
+    @staticmethod
+    def _match(
+        rules: dict,
+        matcher: AhoCorasick,
+        categories: List[str],
+        desc_lower: str,
+        merchant_lower: str,
+        amount: float
+    ) -> str:
+        desc_hits = set(matcher.iter_matches(desc_lower))
+        
+        if amount > 0 and "income" in rules:
+            for priority, _ in desc_hits:
+                if priority == CategorizationService.INCOME_PRIORITY:
+                    return "income"
+            threshold = rules["income"].get("amount_threshold")
+            if threshold is not None and amount >= threshold:
+                return "income"
+        
+        # Lowest priority index wins, matching the RULES iteration order
+        best = None
+        for priority, kind in desc_hits:
+            if priority >= 0 and kind == CategorizationService.KEYWORD:
+                if best is None or priority < best:
+                    best = priority
+        
+        for priority, _ in matcher.iter_matches(merchant_lower):
+            if priority >= 0 and (best is None or priority < best):
+                best = priority
+        
+        return categories[best] if best is not None else "other"
+    
+    @staticmethod
+    def cache_stats() -> dict:
+        return CategorizationService._memo.stats()
+    
     @staticmethod
     def apply_user_rule(description: str, merchant: Optional[str], user_category: str) -> str:
         return user_category
@@ -0,0 +1,195 @@
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from app.models.category_stats import CategoryStats
+from app.models.transaction import Transaction
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+import math
+import logging
+
+logger = logging.getLogger(__name__)
+
+class CategoryStatsService:
+    """Running per-(account, category) mean/variance of absolute amounts (Welford/Chan)"""
+    
+    @staticmethod
+    def _aggregate(amounts: Iterable[float]) -> Tuple[int, float, float]:
+        count, mean, m2 = 0, 0.0, 0.0
+        for amount in amounts:
+            count += 1
+            delta = amount - mean
+            mean += delta / count
+            m2 += delta * (amount - mean)
+        return count, mean, m2
+    
+    @staticmethod
+    def _merge(stats: CategoryStats, count: int, mean: float, m2: float):
+        if count == 0:
+            return
+        total = stats.count + count
+        delta = mean - stats.mean
+        stats.mean = stats.mean + delta * count / total
+        stats.m2 = stats.m2 + m2 + delta * delta * stats.count * count / total
+        stats.count = total
+    
+    @staticmethod
+    def stdev(stats: CategoryStats) -> Optional[float]:
+        if stats.count < 2:
+            return None
+        return math.sqrt(max(stats.m2, 0.0) / (stats.count - 1))
+    
+    @staticmethod
+    def get_stats(db: Session, account_id: int) -> Dict[str, CategoryStats]:
+        return CategoryStatsService.get_stats_many(db, [account_id]).get(account_id, {})
+    
+    @staticmethod
+    def get_stats_many(db: Session, account_ids: List[int]) -> Dict[int, Dict[str, CategoryStats]]:
+        result: Dict[int, Dict[str, CategoryStats]] = {}
+        for row in db.query(CategoryStats).filter(CategoryStats.account_id.in_(account_ids)):
+            result.setdefault(row.account_id, {})[row.category] = row
+        return result
+    
+    @staticmethod
+    def apply_batch(db: Session, account_id: int, rows: Iterable[dict]):
+        """Fold newly ingested transactions into the running stats; the caller commits"""
+        amounts_by_category: Dict[str, list] = {}
+        for row in rows:
+            if row["category"] is None:
+                continue
+            amounts_by_category.setdefault(row["category"], []).append(abs(row["amount"]))
+        
+        if not amounts_by_category:
+            return
+        
+        query = db.query(CategoryStats).filter(
+            CategoryStats.account_id == account_id,
+            CategoryStats.category.in_(list(amounts_by_category))
+        )
+        existing = {stats.category: stats for stats in query}
+        
+        missing = [category for category in amounts_by_category if category not in existing]
+        if missing:
+            # A rebuild or another sync may create the same rows concurrently, so insert
+            # empty rows that tolerate the unique constraint, then merge into whichever won
+            stmt = CategoryStatsService._insert(db).values([
+                {"account_id": account_id, "category": category, "count": 0, "mean": 0.0, "m2": 0.0}
+                for category in missing
+            ])
+            db.execute(stmt.on_conflict_do_nothing(index_elements=["account_id", "category"]))
+            existing = {stats.category: stats for stats in query.populate_existing()}
+        
+        for category, amounts in amounts_by_category.items():
+            CategoryStatsService._merge(existing[category], *CategoryStatsService._aggregate(amounts))
+        
+        db.flush()
+    
+    @staticmethod
+    def remove_value(db: Session, account_id: int, category: str, amount: float):
+        """Take one transaction back out of the stats (reconciliation edits)"""
+        stats = db.query(CategoryStats).filter(
+            CategoryStats.account_id == account_id,
+            CategoryStats.category == category
+        ).first()
+        if stats is None or stats.count == 0:
+            return
+        
+        value = abs(amount)
+        if stats.count == 1:
+            stats.count, stats.mean, stats.m2 = 0, 0.0, 0.0
+            return
+        
+        remaining = stats.count - 1
+        new_mean = (stats.count * stats.mean - value) / remaining
+        stats.m2 = max(stats.m2 - (value - stats.mean) * (value - new_mean), 0.0)
+        stats.mean = new_mean
+        stats.count = remaining
+    
+    @staticmethod
+    def replace_value(
+        db: Session,
+        account_id: int,
+        old_category: Optional[str],
+        old_amount: float,
+        new_category: Optional[str],
+        new_amount: float
+    ):
+        # Accounts without stats yet get a full rebuild on first use instead
+        if db.query(CategoryStats.id).filter(CategoryStats.account_id == account_id).first() is None:
+            return
+        
+        if old_category is not None:
+            CategoryStatsService.remove_value(db, account_id, old_category, old_amount)
+        CategoryStatsService.apply_batch(db, account_id, [{"category": new_category, "amount": new_amount}])
+    
+    @staticmethod
+    def ensure_tracked(db: Session, account_ids: List[int]):
+        """Backfill stats from the ledger for accounts that have none yet.
+        
+        Call before folding in new rows, so the first sync after tracking started builds on
+        the account's full history instead of only its newest page.
+        """
+        tracked = {
+            account_id for (account_id,) in db.query(CategoryStats.account_id).filter(
+                CategoryStats.account_id.in_(account_ids)
+            ).distinct()
+        }
+        missing = [account_id for account_id in account_ids if account_id not in tracked]
+        if missing:
+            CategoryStatsService.rebuild_many(db, missing)
+    
+    @staticmethod
+    def rebuild(db: Session, account_id: int) -> Dict[str, CategoryStats]:
+        """Recompute stats from the ledger; used to backfill accounts synced before tracking"""
+        return CategoryStatsService.rebuild_many(db, [account_id]).get(account_id, {})
+    
+    @staticmethod
+    def rebuild_many(db: Session, account_ids: List[int]) -> Dict[int, Dict[str, CategoryStats]]:
+        rows = db.query(Transaction.account_id, Transaction.category, Transaction.amount).filter(
+            Transaction.account_id.in_(account_ids),
+            Transaction.category.isnot(None)
+        ).all()
+        
+        db.query(CategoryStats).filter(
+            CategoryStats.account_id.in_(account_ids)
+        ).delete(synchronize_session=False)
+        
+        if rows:
+            codes: Dict[Tuple[int, str], int] = {}
+            inverse = np.fromiter(
+                (codes.setdefault((row[0], row[1]), len(codes)) for row in rows),
+                dtype=np.int64,
+                count=len(rows)
+            )
+            values = np.abs(np.fromiter((row[2] for row in rows), dtype=np.float64, count=len(rows)))
+            
+            counts = np.bincount(inverse)
+            means = np.bincount(inverse, weights=values) / counts
+            m2s = np.bincount(inverse, weights=(values - means[inverse]) ** 2)
+            
+            # Upsert: a sync racing this rebuild may have re-created some rows after the delete
+            stmt = CategoryStatsService._insert(db).values([
+                {
+                    "account_id": account_id, "category": category,
+                    "count": int(counts[code]), "mean": float(means[code]), "m2": float(m2s[code])
+                }
+                for (account_id, category), code in codes.items()
+            ])
+            db.execute(stmt.on_conflict_do_update(
+                index_elements=["account_id", "category"],
+                set_={column: stmt.excluded[column] for column in ("count", "mean", "m2")}
+            ))
+        
+        result: Dict[int, Dict[str, CategoryStats]] = {}
+        for stats in db.query(CategoryStats).filter(
+            CategoryStats.account_id.in_(account_ids)
+        ).populate_existing():
+            result.setdefault(stats.account_id, {})[stats.category] = stats
+        return result
+    
+    @staticmethod
+    def _insert(db: Session):
+        """INSERT with ON CONFLICT support for the bound dialect (PostgreSQL or SQLite)"""
+        if db.get_bind().dialect.name == "postgresql":
+            return postgresql_insert(CategoryStats)
+        return sqlite_insert(CategoryStats)
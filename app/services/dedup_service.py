@@ -1,11 +1,14 @@
 from sqlalchemy.orm import Session
 from app.models.transaction import Transaction
-from typing import Optional
+from typing import Optional, Iterable, Set, Dict, Tuple, List
 import logging
 
 logger = logging.getLogger(__name__)
 
 class DeduplicationService:
+    # Keeps IN (...) lists under SQLite's bound-parameter limit
+    IN_CLAUSE_CHUNK_SIZE = 500
+    
     @staticmethod
     def is_duplicate(db: Session, txn_hash: str) -> bool:
         try:
@@ -31,6 +34,42 @@ class DeduplicationService:
             logger.error(f"Find transaction error: {e}")
             return None
     
+    @staticmethod
+    def find_existing_batch(
+        db: Session,
+        hashes: Iterable[str],
+        provider_txn_ids: Iterable[str],
+        account_id: int
+    ) -> Tuple[Set[str], Dict[str, Transaction]]:
+        """Resolve a page of hashes and provider ids with set-based IN queries"""
+        existing_hashes: Set[str] = set()
+        existing_by_provider_id: Dict[str, Transaction] = {}
+        
+        try:
+            for chunk in DeduplicationService._chunks(hashes):
+                rows = db.query(Transaction.hash).filter(
+                    Transaction.hash.in_(chunk)
+                ).all()
+                existing_hashes.update(row.hash for row in rows)
+            
+            for chunk in DeduplicationService._chunks(provider_txn_ids):
+                rows = db.query(Transaction).filter(
+                    Transaction.account_id == account_id,
+                    Transaction.provider_txn_id.in_(chunk)
+                ).all()
+                for txn in rows:
+                    existing_by_provider_id.setdefault(txn.provider_txn_id, txn)
+        except Exception as e:
+            logger.error(f"Batch dedup lookup error: {e}")
+        
+        return existing_hashes, existing_by_provider_id
+    
+    @staticmethod
+    def _chunks(values: Iterable[str]) -> List[List[str]]:
+        unique = list(dict.fromkeys(v for v in values if v is not None))
+        size = DeduplicationService.IN_CLAUSE_CHUNK_SIZE
+        return [unique[i:i + size] for i in range(0, len(unique), size)]
+    
     @staticmethod
     def mark_as_duplicate(db: Session, transaction: Transaction):
         transaction.is_duplicate = True
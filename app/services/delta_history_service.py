@@ -1,6 +1,7 @@
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 from app.models.audit_log import AuditLog
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 import logging
 
 logger = logging.getLogger(__name__)
@@ -38,6 +39,12 @@ class DeltaHistoryService:
             logger.error(f"Failed to log change: {e}")
             db.rollback()
     
+    @staticmethod
+    def log_changes_bulk(db: Session, entries: List[Dict[str, Any]]):
+        """Insert many audit rows in one executemany; the caller owns the commit"""
+        if entries:
+            db.execute(insert(AuditLog), entries)
+    
     @staticmethod
     def get_transaction_history(db: Session, transaction_id: int):
         return db.query(AuditLog).filter(
@@ -0,0 +1,111 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from app.models.merchant_first_seen import MerchantFirstSeen
+from app.models.transaction import Transaction
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+class MerchantHistoryService:
+    """First-seen date per (account, normalized merchant), maintained on ingest"""
+    
+    @staticmethod
+    def normalize(merchant: Optional[str]) -> Optional[str]:
+        if not merchant:
+            return None
+        key = " ".join(merchant.lower().split())
+        return key or None
+    
+    @staticmethod
+    def _as_utc(value: datetime) -> datetime:
+        return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+    
+    @staticmethod
+    def record(db: Session, account_id: int, rows: Iterable[dict]):
+        """Fold new transactions (merchant, date) into the index; the caller commits"""
+        earliest: Dict[str, datetime] = {}
+        for row in rows:
+            key = MerchantHistoryService.normalize(row.get("merchant"))
+            seen_date = MerchantHistoryService._as_utc(row["date"])
+            if key and (key not in earliest or seen_date < earliest[key]):
+                earliest[key] = seen_date
+        
+        if not earliest:
+            return
+        
+        existing = {
+            entry.merchant_key: entry
+            for entry in db.query(MerchantFirstSeen).filter(
+                MerchantFirstSeen.account_id == account_id,
+                MerchantFirstSeen.merchant_key.in_(list(earliest))
+            )
+        }
+        
+        for key, seen_date in earliest.items():
+            entry = existing.get(key)
+            if entry is None:
+                db.add(MerchantFirstSeen(account_id=account_id, merchant_key=key, first_seen_date=seen_date))
+            elif seen_date < entry.first_seen_date:
+                entry.first_seen_date = seen_date
+        
+        db.flush()
+    
+    @staticmethod
+    def record_if_indexed(db: Session, account_id: int, merchant: Optional[str], seen_date: datetime):
+        # Accounts without an index yet get a full rebuild on first use instead
+        if db.query(MerchantFirstSeen.id).filter(MerchantFirstSeen.account_id == account_id).first() is None:
+            return
+        MerchantHistoryService.record(db, account_id, [{"merchant": merchant, "date": seen_date}])
+    
+    @staticmethod
+    def lookup(
+        db: Session,
+        account_ids: List[int],
+        merchant_keys: Iterable[str]
+    ) -> Dict[Tuple[int, str], datetime]:
+        keys = list({key for key in merchant_keys if key})
+        if not keys:
+            return {}
+        
+        return {
+            (account_id, merchant_key): first_seen_date
+            for account_id, merchant_key, first_seen_date in db.query(
+                MerchantFirstSeen.account_id,
+                MerchantFirstSeen.merchant_key,
+                MerchantFirstSeen.first_seen_date
+            ).filter(
+                MerchantFirstSeen.account_id.in_(account_ids),
+                MerchantFirstSeen.merchant_key.in_(keys)
+            )
+        }
+    
+    @staticmethod
+    def ensure_indexed(db: Session, account_ids: List[int]):
+        """Backfill the index from the ledger for accounts that have no entries yet"""
+        indexed = {
+            account_id for (account_id,) in db.query(MerchantFirstSeen.account_id).filter(
+                MerchantFirstSeen.account_id.in_(account_ids)
+            ).distinct()
+        }
+        missing = [account_id for account_id in account_ids if account_id not in indexed]
+        if not missing:
+            return
+        
+        earliest: Dict[Tuple[int, str], datetime] = {}
+        for account_id, merchant, first_date in db.query(
+            Transaction.account_id,
+            Transaction.merchant,
+            func.min(Transaction.date)
+        ).filter(
+            Transaction.account_id.in_(missing),
+            Transaction.merchant.isnot(None)
+        ).group_by(Transaction.account_id, Transaction.merchant):
+            key = MerchantHistoryService.normalize(merchant)
+            if key and ((account_id, key) not in earliest or first_date < earliest[(account_id, key)]):
+                earliest[(account_id, key)] = first_date
+        
+        for (account_id, key), first_date in earliest.items():
+            db.add(MerchantFirstSeen(account_id=account_id, merchant_key=key, first_seen_date=first_date))
+        db.flush()
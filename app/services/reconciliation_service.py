@@ -1,7 +1,12 @@
 from sqlalchemy.orm import Session
 from app.models.transaction import Transaction
 from app.services.delta_history_service import DeltaHistoryService
+from app.services.category_stats_service import CategoryStatsService
+from app.services.merchant_history_service import MerchantHistoryService
+from app.services.budget_ledger_service import BudgetLedgerService
+from app.services.budget_service import BudgetService
 from app.schemas.transaction_schemas import TransactionReconcile
+from datetime import datetime
 import logging
 
 logger = logging.getLogger(__name__)
@@ -22,6 +27,8 @@ class ReconciliationService:
             if not transaction:
                 raise ValueError("Transaction not found")
             
+            old_amount, old_category = transaction.amount, transaction.category
+            
             # Track all changes
             if reconcile_data.amount is not None and reconcile_data.amount != transaction.amount:
                 DeltaHistoryService.log_change(
@@ -54,11 +61,32 @@ class ReconciliationService:
                     "user", reconcile_data.reason, user_id=user_id
                 )
                 transaction.merchant = reconcile_data.merchant
+                MerchantHistoryService.record_if_indexed(
+                    db, transaction.account_id, transaction.merchant, transaction.date
+                )
+            
+            spend_changed = (old_amount, old_category) != (transaction.amount, transaction.category)
+            if spend_changed:
+                CategoryStatsService.replace_value(
+                    db, transaction.account_id,
+                    old_category, old_amount,
+                    transaction.category, transaction.amount
+                )
             
             transaction.updated_at = datetime.utcnow()
             db.commit()
             db.refresh(transaction)
             
+            if spend_changed:
+                owner_id = transaction.account.user_id
+                BudgetLedgerService.invalidate(owner_id, transaction.date)
+                # Keep current_spend in step with the ledger so GET /budgets and alerts agree
+                BudgetService.apply_reconciliation(
+                    db, owner_id, transaction.date,
+                    old_category, old_amount,
+                    transaction.category, transaction.amount
+                )
+            
             return transaction
             
         except Exception as e:
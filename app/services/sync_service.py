@@ -1,8 +1,11 @@
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 from app.models.account import Account
 from app.models.transaction import Transaction
 from app.models.sync_cursor import SyncCursor
 from app.providers.provider_registry import provider_registry
+from app.providers.base_provider import TransactionPage
+from app.normalization.base_normalizer import BaseNormalizer
 from app.normalization.banka_normalizer import BankANormalizer
 from app.normalization.bankb_normalizer import BankBNormalizer
 from app.normalization.bankc_normalizer import BankCNormalizer
@@ -10,10 +13,15 @@ from app.services.dedup_service import DeduplicationService
 from app.services.categorization_service import CategorizationService
 from app.services.budget_service import BudgetService
 from app.services.delta_history_service import DeltaHistoryService
+from app.services.category_stats_service import CategoryStatsService
+from app.services.merchant_history_service import MerchantHistoryService
 from app.core.security import decrypt_token
 from app.core.hashing import generate_transaction_hash
+from app.schemas.transaction_schemas import TransactionBase
+from app.core.timing import StageTimer, percentile
 from app.cache import cache
 from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Tuple
 import time
 import logging
 
@@ -27,8 +35,16 @@ class SyncService:
     }
     
     @staticmethod
-    def sync_account(db: Session, account_id: int) -> dict:
+    def sync_account(
+        db: Session,
+        account_id: int,
+        raw_transactions: Optional[List[Dict[str, Any]]] = None,
+        pages: Optional[Iterable[TransactionPage]] = None
+    ) -> dict:
+        """Sync one account; `pages`, when given, is pulled lazily with one commit per page"""
         start_time = time.time()
+        account = None
+        timer = None
         
         try:
             account = db.query(Account).filter(Account.id == account_id).first()
@@ -41,106 +57,82 @@ class SyncService:
             if not normalizer:
                 return {"error": f"Normalizer not found for {account.provider_id}"}
             
-            access_token = decrypt_token(account.access_token_encrypted)
+            CategorizationService.refresh_rules(db)
             
-            raw_transactions = provider.fetch_transactions(
-                access_token,
-                account.provider_account_id,
-                account.last_synced
-            )
-            
-            records_fetched = len(raw_transactions)
-            records_inserted = 0
-            records_deduplicated = 0
-            records_updated = 0
+            if pages is not None:
+                pages = iter(pages)
+            elif raw_transactions is None:
+                access_token = decrypt_token(account.access_token_encrypted)
+                
+                pages = provider.iter_transaction_pages(
+                    access_token,
+                    account.provider_account_id,
+                    account.sync_cursor,
+                    account.last_synced
+                )
+            else:
+                # Pushed rows come without a provider cursor, so keep the persisted one
+                pages = iter([TransactionPage(transactions=raw_transactions, next_cursor=account.sync_cursor)])
             
-            for raw_txn in raw_transactions:
-                try:
-                    normalized = normalizer.normalize_transaction(raw_txn)
-                    
-                    txn_hash = generate_transaction_hash(
-                        normalized.date,
-                        normalized.amount,
-                        normalized.description,
-                        account.provider_id
-                    )
-                    
-                    if DeduplicationService.is_duplicate(db, txn_hash):
-                        records_deduplicated += 1
-                        continue
-                    
-                    provider_txn_id = (raw_txn.get("id") or 
-                                      raw_txn.get("txn_id") or 
-                                      raw_txn.get("transaction_id"))
-                    
-                    existing_txn = DeduplicationService.find_existing_transaction(
-                        db, provider_txn_id, account_id
-                    )
-                    
-                    if existing_txn:
-                        if existing_txn.amount != normalized.amount:
-                            DeltaHistoryService.log_change(
-                                db, existing_txn.id, "correction", "amount",
-                                str(existing_txn.amount), str(normalized.amount),
-                                "system", "Provider correction"
-                            )
-                            existing_txn.amount = normalized.amount
-                        
-                        records_updated += 1
-                        continue
-                    
-                    category = CategorizationService.categorize(
-                        normalized.description,
-                        normalized.merchant,
-                        normalized.amount
-                    )
-                    
-                    transaction = Transaction(
-                        account_id=account_id,
-                        provider_txn_id=provider_txn_id,
-                        date=normalized.date,
-                        amount=normalized.amount,
-                        description=normalized.description,
-                        merchant=normalized.merchant,
-                        category=category,
-                        hash=txn_hash
-                    )
-                    
-                    db.add(transaction)
-                    records_inserted += 1
-                    
-                    db.flush() 
-                    DeltaHistoryService.log_change(
-                        db, transaction.id, "create", None, None, None,
-                        "system", "Sync"
-                    )
-                    
-                    if normalized.amount < 0:
-                        BudgetService.update_budget_spending(
-                            db, account.user_id, category, normalized.amount
-                        )
-                    
-                except Exception as e:
-                    logger.error(f"Error processing transaction: {e}")
-                    continue
+            user_id = account.user_id
+            timer = StageTimer()
+            stats = {
+                "records_fetched": 0,
+                "records_inserted": 0,
+                "records_deduplicated": 0,
+                "records_updated": 0
+            }
+            budget_categories = set()
             
-            account.last_synced = datetime.now(timezone.utc)
-            account.updated_at = datetime.now(timezone.utc)
-            db.commit()
+            while True:
+                fetch_start = time.perf_counter()
+                page = next(pages, None)
+                if page is None:
+                    break
+                timer.add("fetch", time.perf_counter() - fetch_start, len(page.transactions))
+                
+                new_rows, corrections = SyncService._ingest_page(
+                    db, account, normalizer, page.transactions, stats, timer
+                )
+                
+                # Each page commits with its cursor so a crash resumes after it
+                with timer.stage("db_write"):
+                    account.sync_cursor = page.next_cursor
+                    db.commit()
+                
+                spending = [row for row in new_rows if row["amount"] < 0]
+                with timer.stage("budget_update", len(spending)):
+                    budget_categories |= BudgetService.apply_spending_batch(db, user_id, spending)
+                    # Provider corrections move spend through the same path as reconciliation
+                    budget_categories |= BudgetService.apply_corrections_batch(db, user_id, corrections)
             
-            cache.invalidate_pattern(f"account:{account_id}:*")
-            cache.invalidate_pattern(f"user:{account.user_id}:*")
+            # Budget alerts and cache invalidation share one Redis round trip, sent once
+            # last_synced is committed
+            with cache.pipeline() as pipe:
+                # Thresholds are checked once per sync so a backfill yields one alert per budget
+                with timer.stage("budget_update"):
+                    BudgetService.evaluate_thresholds(db, user_id, budget_categories, pipe=pipe)
+                
+                with timer.stage("db_write"):
+                    account.last_synced = datetime.now(timezone.utc)
+                    account.updated_at = datetime.now(timezone.utc)
+                    db.commit()
+                
+                with timer.stage("cache_invalidation", 2):
+                    cache.invalidate_tags(f"account:{account_id}", f"user:{user_id}", pipe=pipe)
             
             duration = time.time() - start_time
             sync_cursor = SyncCursor(
                 account_id=account_id,
                 provider_id=account.provider_id,
+                cursor_value=account.sync_cursor,
                 last_sync_date=datetime.now(timezone.utc),
                 status="success",
-                records_fetched=records_fetched,
-                records_inserted=records_inserted,
-                records_deduplicated=records_deduplicated,
-                duration_seconds=duration
+                records_fetched=stats["records_fetched"],
+                records_inserted=stats["records_inserted"],
+                records_deduplicated=stats["records_deduplicated"],
+                duration_seconds=duration,
+                meta_info={"stages": timer.to_dict()}
             )
             db.add(sync_cursor)
             db.commit()
@@ -148,25 +140,242 @@ class SyncService:
             return {
                 "status": "success",
                 "account_id": account_id,
-                "records_fetched": records_fetched,
-                "records_inserted": records_inserted,
-                "records_deduplicated": records_deduplicated,
-                "records_updated": records_updated,
+                **stats,
                 "duration_seconds": round(duration, 3)
             }
             
         except Exception as e:
             logger.error(f"Sync error for account {account_id}: {e}")
+            db.rollback()
             duration = time.time() - start_time
             
             sync_cursor = SyncCursor(
                 account_id=account_id,
                 provider_id=account.provider_id if account else "unknown",
+                cursor_value=account.sync_cursor if account else None,
                 status="failed",
                 error_message=str(e),
-                duration_seconds=duration
+                duration_seconds=duration,
+                meta_info={"stages": timer.to_dict()} if timer is not None else None
             )
             db.add(sync_cursor)
             db.commit()
             
             return {"status": "error", "message": str(e)}
+    
+    @staticmethod
+    def get_stage_percentiles(db: Session, account_id: int, limit: int = 50) -> dict:
+        """Per-stage p50/p90/p99 wall time over the most recent successful syncs"""
+        runs = db.query(SyncCursor.meta_info).filter(
+            SyncCursor.account_id == account_id,
+            SyncCursor.status == "success"
+        ).order_by(SyncCursor.created_at.desc()).limit(limit).all()
+        
+        samples: Dict[str, List[float]] = {}
+        for (meta_info,) in runs:
+            for name, entry in ((meta_info or {}).get("stages") or {}).items():
+                samples.setdefault(name, []).append(entry["seconds"])
+        
+        stages = {}
+        for name, values in samples.items():
+            values.sort()
+            stages[name] = {
+                "samples": len(values),
+                "p50": round(percentile(values, 50), 6),
+                "p90": round(percentile(values, 90), 6),
+                "p99": round(percentile(values, 99), 6),
+                "max": round(values[-1], 6)
+            }
+        
+        return {"runs": len(runs), "stages": stages}
+    
+    @staticmethod
+    def _prepare(
+        normalizer: BaseNormalizer,
+        provider_id: str,
+        raw_transactions: Iterable[Dict[str, Any]],
+        timer: StageTimer
+    ) -> Iterator[Tuple[TransactionBase, str, Optional[str]]]:
+        normalize_seconds = hash_seconds = 0.0
+        normalized_count = 0
+        
+        for raw_txn in raw_transactions:
+            try:
+                started = time.perf_counter()
+                normalized = normalizer.normalize_transaction(raw_txn)
+                hashed = time.perf_counter()
+                normalize_seconds += hashed - started
+                normalized_count += 1
+                
+                txn_hash = generate_transaction_hash(
+                    normalized.date,
+                    normalized.amount,
+                    normalized.description,
+                    provider_id
+                )
+                hash_seconds += time.perf_counter() - hashed
+                
+                provider_txn_id = (raw_txn.get("id") or 
+                                  raw_txn.get("txn_id") or 
+                                  raw_txn.get("transaction_id"))
+                
+                yield normalized, txn_hash, provider_txn_id
+            except Exception as e:
+                logger.error(f"Error normalizing transaction: {e}")
+                continue
+        
+        timer.add("normalize", normalize_seconds, normalized_count)
+        timer.add("hash", hash_seconds, normalized_count)
+    
+    @staticmethod
+    def _ingest_page(
+        db: Session,
+        account: Account,
+        normalizer: BaseNormalizer,
+        raw_transactions: List[Dict[str, Any]],
+        stats: Dict[str, int],
+        timer: StageTimer
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Normalize, hash, dedup and write one page; the caller commits.
+        
+        Returns the inserted rows and the provider amount corrections, for budget updates.
+        """
+        stats["records_fetched"] += len(raw_transactions)
+        
+        prepared = list(SyncService._prepare(
+            normalizer, account.provider_id, raw_transactions, timer
+        ))
+        
+        with timer.stage("dedup", len(prepared)):
+            seen_hashes, existing_by_provider_id = DeduplicationService.find_existing_batch(
+                db,
+                [txn_hash for _, txn_hash, _ in prepared],
+                [provider_txn_id for _, _, provider_txn_id in prepared],
+                account.id
+            )
+        
+        # Accounts synced before stats tracking start from their full ledger, not this page
+        CategoryStatsService.ensure_tracked(db, [account.id])
+        
+        categorize_seconds = 0.0
+        
+        new_rows = []
+        corrections = []
+        correction_audits = []
+        pending_by_provider_id = {}
+        for normalized, txn_hash, provider_txn_id in prepared:
+            try:
+                if txn_hash in seen_hashes:
+                    stats["records_deduplicated"] += 1
+                    continue
+                
+                pending_row = pending_by_provider_id.get(provider_txn_id)
+                if pending_row:
+                    pending_row["amount"] = normalized.amount
+                    stats["records_updated"] += 1
+                    continue
+                
+                existing_txn = existing_by_provider_id.get(provider_txn_id)
+                
+                if existing_txn:
+                    if existing_txn.amount != normalized.amount:
+                        correction_audits.append({
+                            "transaction_id": existing_txn.id,
+                            "action": "correction",
+                            "field_changed": "amount",
+                            "old_value": str(existing_txn.amount),
+                            "new_value": str(normalized.amount),
+                            "changed_by": "system",
+                            "reason": "Provider correction"
+                        })
+                        corrections.append({
+                            "date": existing_txn.date,
+                            "old_category": existing_txn.category,
+                            "old_amount": existing_txn.amount,
+                            "new_category": existing_txn.category,
+                            "new_amount": normalized.amount
+                        })
+                        CategoryStatsService.replace_value(
+                            db, account.id,
+                            existing_txn.category, existing_txn.amount,
+                            existing_txn.category, normalized.amount
+                        )
+                        existing_txn.amount = normalized.amount
+                    
+                    stats["records_updated"] += 1
+                    continue
+                
+                started = time.perf_counter()
+                category = CategorizationService.categorize(
+                    normalized.description,
+                    normalized.merchant,
+                    normalized.amount
+                )
+                categorize_seconds += time.perf_counter() - started
+                
+                row = {
+                    "account_id": account.id,
+                    "provider_txn_id": provider_txn_id,
+                    "date": normalized.date,
+                    "amount": normalized.amount,
+                    "description": normalized.description,
+                    "merchant": normalized.merchant,
+                    "category": category,
+                    "hash": txn_hash
+                }
+                new_rows.append(row)
+                pending_by_provider_id[provider_txn_id] = row
+                stats["records_inserted"] += 1
+                
+                seen_hashes.add(txn_hash)
+                
+            except Exception as e:
+                logger.error(f"Error processing transaction: {e}")
+                continue
+        
+        timer.add("categorize", categorize_seconds, len(new_rows))
+        
+        # Audit rows are written with the page rather than committed one by one
+        DeltaHistoryService.log_changes_bulk(db, correction_audits)
+        
+        if new_rows:
+            with timer.stage("db_write", len(new_rows)):
+                ids_by_hash = SyncService.bulk_insert_transactions(db, new_rows)
+                DeltaHistoryService.log_changes_bulk(db, [
+                    {
+                        "transaction_id": ids_by_hash[row["hash"]],
+                        "action": "create",
+                        "changed_by": "system",
+                        "reason": "Sync"
+                    }
+                    for row in new_rows
+                ])
+                CategoryStatsService.apply_batch(db, account.id, new_rows)
+                MerchantHistoryService.ensure_indexed(db, [account.id])
+                MerchantHistoryService.record(db, account.id, new_rows)
+        
+        return new_rows, corrections
+    
+    @staticmethod
+    def bulk_insert_transactions(db: Session, rows: List[Dict[str, Any]]) -> Dict[str, int]:
+        """Insert new transactions in one multi-row statement, returning ids by hash"""
+        dialect = db.get_bind().dialect
+        
+        if dialect.insert_executemany_returning:
+            result = db.execute(
+                insert(Transaction).returning(
+                    Transaction.id, Transaction.hash, sort_by_parameter_order=True
+                ),
+                rows
+            )
+            return {row.hash: row.id for row in result}
+        
+        db.execute(insert(Transaction), rows)
+        
+        ids_by_hash = {}
+        for chunk in DeduplicationService._chunks(row["hash"] for row in rows):
+            for row in db.query(Transaction.id, Transaction.hash).filter(
+                Transaction.hash.in_(chunk)
+            ):
+                ids_by_hash[row.hash] = row.id
+        return ids_by_hash
@@ -0,0 +1,177 @@
+import pytest
+import json
+import time
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+from app.jobs import alert_job
+from app.services.alert_service import ALERT_STREAM
+
+def make_entry(message_id, **alert):
+    return (message_id, {"data": json.dumps({"type": "budget_alert", "user_id": 1, **alert})})
+
+def fake_pending(client, entries):
+    """Serve XPENDING ranges from `entries`, directly or through a pipeline, like Redis would"""
+    def xpending_range(name, groupname, min, max, count, consumername=None, idle=None):
+        matching = [
+            entry for entry in entries
+            if min <= entry["message_id"] <= max and consumername in (None, entry["consumer"])
+        ]
+        return matching[:count]
+    
+    queued = []
+    pipe = client.pipeline.return_value
+    pipe.xpending_range.side_effect = lambda *args, **kwargs: queued.append(xpending_range(*args, **kwargs))
+    pipe.execute.side_effect = lambda: [queued.pop(0) for _ in list(queued)]
+    client.xpending_range.side_effect = xpending_range
+
+class TestAlertConsumer:
+    
+    def make_client(self, claimed=None, new=None, delivered=None):
+        client = MagicMock()
+        client.xautoclaim.return_value = ["0-0", claimed or [], []]
+        client.xreadgroup.return_value = [[ALERT_STREAM, new or []]] if new else []
+        fake_pending(client, [
+            {"message_id": message_id, "consumer": "worker-1", "times_delivered": count}
+            for message_id, count in (delivered or {}).items()
+        ])
+        return client
+    
+    def test_drains_batch_and_acks_once(self):
+        client = self.make_client(new=[make_entry("1-0"), make_entry("2-0"), make_entry("3-0")])
+        
+        stats = alert_job.process_batch(client, "worker-1")
+        
+        assert stats["delivered"] == 3
+        client.xack.assert_called_once_with(ALERT_STREAM, alert_job.ALERT_GROUP, "1-0", "2-0", "3-0")
+        client.xtrim.assert_called_once()
+    
+    def test_failed_alert_stays_pending(self):
+        client = self.make_client(new=[make_entry("1-0"), make_entry("2-0", category="boom")])
+        
+        def handle(alert):
+            if alert.get("category") == "boom":
+                raise RuntimeError("downstream unavailable")
+        
+        with patch.object(alert_job, "handle_alert", side_effect=handle):
+            stats = alert_job.process_batch(client, "worker-1")
+        
+        assert stats == {"delivered": 1, "failed": 1, "retried": 0, "dead_lettered": 0}
+        client.xack.assert_called_once_with(ALERT_STREAM, alert_job.ALERT_GROUP, "1-0")
+    
+    def test_retries_then_dead_letters(self):
+        claimed = [make_entry("1-0"), make_entry("2-0")]
+        client = self.make_client(
+            claimed=claimed,
+            delivered={"1-0": 2, "2-0": alert_job.settings.ALERT_MAX_DELIVERIES + 1}
+        )
+        
+        stats = alert_job.process_batch(client, "worker-1")
+        
+        assert stats["retried"] == 1
+        assert stats["dead_lettered"] == 1
+        assert client.xadd.call_args.args[0] == alert_job.DEAD_LETTER_STREAM
+        client.xack.assert_called_once_with(ALERT_STREAM, alert_job.ALERT_GROUP, "2-0", "1-0")
+    
+    def test_dead_letters_when_other_consumers_share_the_range(self):
+        limit = alert_job.settings.ALERT_MAX_DELIVERIES
+        client = self.make_client(claimed=[make_entry("1-0"), make_entry("4-0")])
+        fake_pending(client, [
+            {"message_id": "1-0", "consumer": "worker-1", "times_delivered": 2},
+            {"message_id": "2-0", "consumer": "worker-2", "times_delivered": 1},
+            {"message_id": "3-0", "consumer": "worker-2", "times_delivered": 1},
+            {"message_id": "4-0", "consumer": "worker-1", "times_delivered": limit + 1}
+        ])
+        
+        stats = alert_job.process_batch(client, "worker-1")
+        
+        assert stats["retried"] == 1
+        assert stats["dead_lettered"] == 1
+        client.xack.assert_called_once_with(ALERT_STREAM, alert_job.ALERT_GROUP, "4-0", "1-0")
+    
+    def test_consumer_lag(self):
+        client = MagicMock()
+        client.xinfo_groups.return_value = [
+            {"name": alert_job.ALERT_GROUP, "pending": 4, "lag": 7, "last-delivered-id": "100-0"}
+        ]
+        added_ms = int((time.time() - 30) * 1000)
+        client.xrange.return_value = [(f"{added_ms}-0", {"data": "{}"})]
+        
+        lag = alert_job.get_consumer_lag(client)
+        
+        assert lag["pending"] == 4
+        assert lag["lag"] == 7
+        assert 29 <= lag["lag_seconds"] < 40
+        assert client.xrange.call_args.kwargs["min"] == "(100-0"
+
+class TestAlertPublishing:
+    
+    def test_budget_alerts_appended_to_stream(self, db_session, test_user):
+        from app.services import alert_service
+        from app.services.budget_service import BudgetService
+        
+        BudgetService.create_budget(db_session, test_user.id, "dining", 100.00, "monthly")
+        
+        with patch.object(alert_service, "cache") as mock_cache:
+            BudgetService.update_budget_spending(db_session, test_user.id, "dining", -120.00)
+        
+        stream, alerts = mock_cache.stream_add.call_args.args
+        assert stream == ALERT_STREAM
+        assert alerts[0]["alert_type"] == "exceeded"
+        mock_cache.publish.assert_not_called()
+
+class TestAlertBroadcast:
+    
+    async def idle_reader(self):
+        await asyncio.Event().wait()
+    
+    def test_one_reader_fans_out_to_user_connections(self):
+        from app.services.alert_broadcaster import AlertBroadcaster
+        
+        async def scenario():
+            broadcaster = AlertBroadcaster(queue_size=2)
+            with patch.object(AlertBroadcaster, "_run", lambda _: self.idle_reader()):
+                first = broadcaster.subscribe(1)
+                second = broadcaster.subscribe(1)
+                other = broadcaster.subscribe(2)
+                reader = broadcaster._task
+                
+                for n in range(3):
+                    broadcaster.dispatch({"type": "budget_alert", "user_id": 1, "n": n})
+                
+                assert broadcaster._task is reader
+                assert broadcaster.connection_count() == 3
+                assert [first.get_nowait()["n"], first.get_nowait()["n"]] == [1, 2]
+                assert second.qsize() == 2
+                assert other.empty()
+                
+                for user_id, queue in [(1, first), (1, second), (2, other)]:
+                    broadcaster.unsubscribe(user_id, queue)
+                await asyncio.sleep(0)
+                assert reader.cancelled()
+                assert broadcaster._task is None
+        
+        asyncio.run(scenario())
+    
+    def test_event_stream_formats_alerts(self):
+        from app.routers import alerts_router
+        from app.services.alert_broadcaster import AlertBroadcaster
+        
+        async def scenario():
+            request = MagicMock()
+            request.is_disconnected = AsyncMock(side_effect=[False, True])
+            with patch.object(AlertBroadcaster, "_run", lambda _: self.idle_reader()):
+                events = alerts_router.alert_events(request, 7)
+                assert await events.__anext__() == ": connected\n\n"
+                alerts_router.alert_broadcaster.dispatch({"type": "budget_alert", "user_id": 7})
+                event = await events.__anext__()
+                await events.aclose()
+            
+            assert event.startswith("event: budget_alert\ndata: ")
+            assert json.loads(event.split("data: ", 1)[1])["user_id"] == 7
+            assert alerts_router.alert_broadcaster.connection_count() == 0
+        
+        asyncio.run(scenario())
+    
+    def test_stream_requires_auth(self, client):
+        response = client.get("/alerts/stream")
+        assert response.status_code in (401, 403)
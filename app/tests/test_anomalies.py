@@ -5,31 +5,31 @@ from app.services.anomaly_service import AnomalyService
 from app.models.transaction import Transaction
 import statistics
 
+def create_baseline_transactions(db_session, account_id, category, count=30):
+    transactions = []
+    for i in range(count):
+        variance = (i % 5) - 2  # -2, -1, 0, 1, 2
+        amount = -50.00 + variance
+        
+        txn = Transaction(
+            account_id=account_id,
+            provider_txn_id=f"BASE_{i}",
+            date=datetime.now(timezone.utc) - timedelta(days=count-i),
+            amount=amount,  
+            description=f"Normal {category} transaction",
+            merchant="Regular Store",
+            category=category,
+            hash=f"hash_{i}"
+        )
+        db_session.add(txn)
+        transactions.append(txn)
+    db_session.commit()
+    return transactions
+
 class TestAnomalyDetection:
     
-    def create_baseline_transactions(self, db_session, account_id, category, count=30):
-        transactions = []
-        for i in range(count):
-            variance = (i % 5) - 2  # -2, -1, 0, 1, 2
-            amount = -50.00 + variance
-            
-            txn = Transaction(
-                account_id=account_id,
-                provider_txn_id=f"BASE_{i}",
-                date=datetime.now(timezone.utc) - timedelta(days=count-i),
-                amount=amount,  
-                description=f"Normal {category} transaction",
-                merchant="Regular Store",
-                category=category,
-                hash=f"hash_{i}"
-            )
-            db_session.add(txn)
-            transactions.append(txn)
-        db_session.commit()
-        return transactions
-    
     def test_detect_unusual_amount_anomaly(self, db_session, test_account):
-        self.create_baseline_transactions(db_session, test_account.id, "groceries", 30)
+        create_baseline_transactions(db_session, test_account.id, "groceries", 30)
         
         anomaly_txn = Transaction(
             account_id=test_account.id,
@@ -50,6 +50,30 @@ class TestAnomalyDetection:
         assert any(a["transaction_id"] == anomaly_txn.id for a in anomalies)
         assert any(a["type"] == "unusual_amount" for a in anomalies)
     
+    def test_unusual_amount_sets_anomaly_flag(self, db_session, test_account):
+        create_baseline_transactions(db_session, test_account.id, "groceries", 30)
+        
+        anomaly_txn = Transaction(
+            account_id=test_account.id,
+            provider_txn_id="ANOMALY_FLAG",
+            date=datetime.now(timezone.utc),
+            amount=-500.00,
+            description="Unusual large purchase",
+            merchant="Regular Store",
+            category="groceries",
+            hash="anomaly_flag_hash"
+        )
+        db_session.add(anomaly_txn)
+        db_session.commit()
+        
+        anomalies = AnomalyService.detect_anomalies(db_session, test_account.id)
+        db_session.refresh(anomaly_txn)
+        
+        unusual = [a for a in anomalies if a["type"] == "unusual_amount"]
+        assert [a["transaction_id"] for a in unusual] == [anomaly_txn.id]
+        assert isinstance(unusual[0]["z_score"], float)
+        assert anomaly_txn.is_anomaly is True
+    
     def test_detect_new_merchant_anomaly(self, db_session, test_account):
         for i in range(10):
             txn = Transaction(
@@ -84,7 +108,7 @@ class TestAnomalyDetection:
         assert len(new_merchant_anomalies) > 0
     
     def test_no_anomalies_with_consistent_pattern(self, db_session, test_account):
-        self.create_baseline_transactions(db_session, test_account.id, "groceries", 30)
+        create_baseline_transactions(db_session, test_account.id, "groceries", 30)
         
         normal_txn = Transaction(
             account_id=test_account.id,
@@ -106,7 +130,7 @@ class TestAnomalyDetection:
         assert not normal_flagged
     
     def test_anomaly_severity_levels(self, db_session, test_account):
-        self.create_baseline_transactions(db_session, test_account.id, "dining", 30)
+        create_baseline_transactions(db_session, test_account.id, "dining", 30)
         
         high_severity = Transaction(
             account_id=test_account.id,
@@ -144,6 +168,130 @@ class TestAnomalyDetection:
         anomalies = AnomalyService.detect_anomalies(db_session, test_account.id)
         assert len(anomalies) == 0  
 
+class TestCategoryStats:
+    
+    def test_sync_updates_running_stats(self, db_session, test_account):
+        from app.services.sync_service import SyncService
+        from app.services.category_stats_service import CategoryStatsService
+        
+        SyncService.sync_account(db_session, test_account.id)
+        
+        stats = CategoryStatsService.get_stats(db_session, test_account.id)
+        assert sum(s.count for s in stats.values()) == 1
+        assert all(s.mean == 50.0 for s in stats.values())
+    
+    def test_first_sync_counts_existing_history(self, db_session, test_account):
+        from app.services.sync_service import SyncService
+        from app.services.category_stats_service import CategoryStatsService
+        
+        now = datetime.now(timezone.utc)
+        for i in range(40):
+            db_session.add(Transaction(
+                account_id=test_account.id,
+                provider_txn_id=f"HIST_{i}",
+                date=now - timedelta(days=10 + i),
+                amount=-(50.0 + i % 5),
+                description="Weekly shop",
+                merchant="Kroger",
+                category="groceries",
+                hash=f"hist_{i}"
+            ))
+        db_session.commit()
+        
+        SyncService.sync_account(db_session, test_account.id, [{
+            "id": "BIG_1", "date": now.replace(tzinfo=None).isoformat(), "amount": -900.0,
+            "description": "Kroger", "merchant": "Kroger"
+        }])
+        
+        stats = CategoryStatsService.get_stats(db_session, test_account.id)["groceries"]
+        assert stats.count == 41
+        big = db_session.query(Transaction).filter(Transaction.provider_txn_id == "BIG_1").one()
+        anomalies = AnomalyService.detect_anomalies(db_session, test_account.id)
+        assert any(a["transaction_id"] == big.id and a["type"] == "unusual_amount" for a in anomalies)
+    
+    def test_batch_merges_into_row_created_concurrently(self, db_session, test_account):
+        from unittest.mock import patch
+        from app.models.category_stats import CategoryStats
+        from app.services.category_stats_service import CategoryStatsService
+        
+        insert = CategoryStatsService._insert
+        
+        def racing_insert(db):
+            # Another sync creates the row between our lookup and our insert
+            db.add(CategoryStats(account_id=test_account.id, category="dining", count=2, mean=10.0, m2=0.0))
+            db.flush()
+            return insert(db)
+        
+        with patch.object(CategoryStatsService, "_insert", side_effect=racing_insert):
+            CategoryStatsService.apply_batch(db_session, test_account.id, [{"category": "dining", "amount": -40.0}])
+        db_session.commit()
+        
+        stats = CategoryStatsService.get_stats(db_session, test_account.id)["dining"]
+        assert (stats.count, stats.mean) == (3, 20.0)
+    
+    def test_batches_match_full_recompute(self, db_session, test_account):
+        from app.services.category_stats_service import CategoryStatsService
+        
+        amounts = [12.5, 40.0, 7.25, 99.0, 63.1, 18.0, 5.5]
+        CategoryStatsService.apply_batch(
+            db_session, test_account.id, [{"category": "dining", "amount": -a} for a in amounts[:3]]
+        )
+        CategoryStatsService.apply_batch(
+            db_session, test_account.id, [{"category": "dining", "amount": -a} for a in amounts[3:]]
+        )
+        db_session.commit()
+        
+        stats = CategoryStatsService.get_stats(db_session, test_account.id)["dining"]
+        assert stats.count == len(amounts)
+        assert abs(stats.mean - statistics.mean(amounts)) < 1e-9
+        assert abs(CategoryStatsService.stdev(stats) - statistics.stdev(amounts)) < 1e-9
+        
+        CategoryStatsService.remove_value(db_session, test_account.id, "dining", -99.0)
+        remaining = [a for a in amounts if a != 99.0]
+        assert abs(stats.mean - statistics.mean(remaining)) < 1e-9
+        assert abs(CategoryStatsService.stdev(stats) - statistics.stdev(remaining)) < 1e-9
+
+class TestMerchantHistory:
+    
+    def test_backfill_uses_full_history(self, db_session, test_account):
+        from app.services.merchant_history_service import MerchantHistoryService
+        
+        create_baseline_transactions(db_session, test_account.id, "groceries", 12)
+        # Seen once long before any lookback window, then again this week
+        for i, days_ago in enumerate([400, 1]):
+            db_session.add(Transaction(
+                account_id=test_account.id,
+                provider_txn_id=f"OLD_MERCHANT_{i}",
+                date=datetime.now(timezone.utc) - timedelta(days=days_ago),
+                amount=-20.00,
+                description="Hardware",
+                merchant="  Old   Hardware ",
+                category="groceries",
+                hash=f"old_merchant_{i}"
+            ))
+        db_session.commit()
+        
+        anomalies = AnomalyService.detect_anomalies(db_session, test_account.id)
+        
+        assert not any(a["type"] == "new_merchant" for a in anomalies)
+        first_seen = MerchantHistoryService.lookup(db_session, [test_account.id], ["old hardware"])
+        assert (datetime.now(timezone.utc) - first_seen[(test_account.id, "old hardware")]).days >= 399
+    
+    def test_index_maintained_on_sync(self, db_session, test_account):
+        from app.services.sync_service import SyncService
+        from app.services.merchant_history_service import MerchantHistoryService
+        
+        now = datetime.now(timezone.utc)
+        SyncService.sync_account(db_session, test_account.id, [
+            {"id": "MH_1", "date": (now - timedelta(days=3)).isoformat(), "amount": -10.0,
+             "description": "Coffee", "merchant": "Corner Cafe"},
+            {"id": "MH_2", "date": (now - timedelta(days=30)).isoformat(), "amount": -12.0,
+             "description": "Coffee", "merchant": "corner cafe"}
+        ])
+        
+        first_seen = MerchantHistoryService.lookup(db_session, [test_account.id], ["corner cafe"])
+        assert (now - first_seen[(test_account.id, "corner cafe")]).days == 30
+
 class TestAnomalyEndpoints:
     
     def test_detect_account_anomalies_endpoint(self, client, auth_headers, test_account, db_session):
@@ -171,9 +319,64 @@ class TestAnomalyEndpoints:
         assert "anomalies" in data
         assert data["account_id"] == test_account.id
     
+    def test_endpoint_reads_precomputed_anomalies(self, client, auth_headers, test_account, db_session):
+        create_baseline_transactions(db_session, test_account.id, "groceries", 30)
+        outlier = Transaction(
+            account_id=test_account.id,
+            provider_txn_id="SWEEP_OUTLIER",
+            date=datetime.now(timezone.utc),
+            amount=-500.00,
+            description="Outlier",
+            merchant="Regular Store",
+            category="groceries",
+            hash="sweep_outlier_hash"
+        )
+        db_session.add(outlier)
+        db_session.commit()
+        
+        before = client.get(f"/anomalies/account/{test_account.id}", headers=auth_headers)
+        assert before.json()["anomalies"] == []
+        
+        AnomalyService.sweep_accounts(db_session, [test_account.id])
+        
+        response = client.get(f"/anomalies/account/{test_account.id}", headers=auth_headers)
+        anomalies = response.json()["anomalies"]
+        assert [a["transaction_id"] for a in anomalies if a["type"] == "unusual_amount"] == [outlier.id]
+    
     def test_anomaly_detection_unauthorized(self, client, auth_headers):
         response = client.get(
             "/anomalies/account/99999",
             headers=auth_headers
         )
         assert response.status_code == status.HTTP_404_NOT_FOUND
+
+class TestAnomalySweepJob:
+    
+    def test_sweep_scores_accounts_in_chunks(self, db_session, test_account):
+        from unittest.mock import patch
+        from app.jobs import anomaly_job
+        from app.models.anomaly import Anomaly
+        from app.tests.conftest import TestingSessionLocal
+        
+        create_baseline_transactions(db_session, test_account.id, "dining", 30)
+        db_session.add(Transaction(
+            account_id=test_account.id,
+            provider_txn_id="JOB_OUTLIER",
+            date=datetime.now(timezone.utc),
+            amount=-400.00,
+            description="Outlier",
+            merchant="Regular Store",
+            category="dining",
+            hash="job_outlier_hash"
+        ))
+        db_session.commit()
+        
+        with patch.object(anomaly_job, "SessionLocal", TestingSessionLocal), \
+             patch.object(anomaly_job.cache, "acquire_lock", return_value=True), \
+             patch.object(anomaly_job.cache, "release_lock"):
+            stats = anomaly_job.run_anomaly_sweep()
+        
+        assert stats["accounts"] == 1
+        assert stats["chunks"] == 1
+        assert stats["anomalies"] >= 1
+        assert db_session.query(Anomaly).filter(Anomaly.account_id == test_account.id).count() == stats["anomalies"]
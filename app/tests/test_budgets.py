@@ -33,6 +33,40 @@ class TestBudgetService:
         
         assert budget.current_spend == 125.00
     
+    def test_apply_spending_batch(self, db_session, test_user):
+        dining = BudgetService.create_budget(db_session, test_user.id, "dining", 300.00, "monthly")
+        groceries = BudgetService.create_budget(db_session, test_user.id, "groceries", 500.00, "monthly")
+        
+        BudgetService.apply_spending_batch(db_session, test_user.id, [
+            {"category": "dining", "amount": -20.00},
+            {"category": "dining", "amount": -30.00},
+            {"category": "groceries", "amount": -45.50},
+            {"category": "groceries", "amount": 100.00},
+            {"category": "travel", "amount": -80.00}
+        ])
+        db_session.refresh(dining)
+        db_session.refresh(groceries)
+        
+        assert dining.current_spend == 50.00
+        assert groceries.current_spend == 45.50
+    
+    def test_spending_increment_is_atomic(self, db_session, test_user):
+        from app.tests.conftest import TestingSessionLocal
+        
+        budget = BudgetService.create_budget(db_session, test_user.id, "dining", 300.00, "monthly")
+        
+        # Another worker adds spend after this session loaded the budget
+        other = TestingSessionLocal()
+        try:
+            BudgetService.update_budget_spending(other, test_user.id, "dining", -40.00)
+        finally:
+            other.close()
+        
+        BudgetService.update_budget_spending(db_session, test_user.id, "dining", -10.00)
+        db_session.refresh(budget)
+        
+        assert budget.current_spend == 50.00
+    
     def test_budget_alert_threshold(self, db_session, test_user):
         budget = BudgetService.create_budget(
             db_session, test_user.id, "entertainment", 100.00, "monthly"
@@ -79,6 +113,54 @@ class TestBudgetService:
         
         assert budget.current_spend == 0.0
     
+    def test_reset_skips_budget_already_in_new_period(self, db_session, test_user):
+        from sqlalchemy.orm.attributes import set_committed_value
+        from app.services.budget_ledger_service import BudgetLedgerService
+        
+        stale = Budget(
+            user_id=test_user.id,
+            category_name="groceries",
+            amount=200.00,
+            period=BudgetPeriod.WEEKLY,
+            current_spend=150.00,
+            period_start=datetime.now(timezone.utc) - timedelta(days=8)
+        )
+        db_session.add(stale)
+        db_session.commit()
+        
+        # Another sync resets and adds new-period spend between our read and our reset
+        db_session.query(Budget).filter(Budget.id == stale.id).update({
+            Budget.current_spend: 25.00,
+            Budget.period_start: BudgetLedgerService.period_bounds(BudgetPeriod.WEEKLY)[0]
+        }, synchronize_session=False)
+        db_session.commit()
+        # Our in-memory view is still the one read before that sync ran
+        set_committed_value(stale, "period_start", datetime.now(timezone.utc) - timedelta(days=8))
+        
+        BudgetService.reset_budget_if_needed(db_session, stale)
+        db_session.refresh(stale)
+        
+        assert stale.current_spend == 25.00
+        assert stale.period_start == BudgetLedgerService.period_bounds(BudgetPeriod.WEEKLY)[0]
+    
+    def test_upgrade_schema_adds_warning_sent(self):
+        from sqlalchemy import create_engine, inspect, text
+        from app.database import upgrade_schema
+        
+        legacy = create_engine("sqlite:///:memory:")
+        with legacy.begin() as conn:
+            conn.execute(text(
+                "CREATE TABLE budgets (id INTEGER PRIMARY KEY, category_name VARCHAR, alert_sent BOOLEAN)"
+            ))
+            conn.execute(text("INSERT INTO budgets (category_name, alert_sent) VALUES ('dining', 0)"))
+        
+        upgrade_schema(legacy)
+        upgrade_schema(legacy)
+        
+        assert "warning_sent" in {c["name"] for c in inspect(legacy).get_columns("budgets")}
+        with legacy.connect() as conn:
+            assert conn.execute(text("SELECT warning_sent FROM budgets")).scalar() == 0
+    
     def test_get_budget_status(self, db_session, test_user):
         BudgetService.create_budget(db_session, test_user.id, "groceries", 500.00, "monthly")
         BudgetService.create_budget(db_session, test_user.id, "dining", 300.00, "monthly")
@@ -92,6 +174,77 @@ class TestBudgetService:
         assert status[0]["category_name"] in ["groceries", "dining"]
         assert status[0]["percentage_used"] > 0
 
+class TestBudgetAlerts:
+    
+    def test_batch_coalesces_to_single_exceeded_alert(self, db_session, test_user):
+        from unittest.mock import patch
+        from app.services import alert_service
+        
+        budget = BudgetService.create_budget(db_session, test_user.id, "dining", 100.00, "monthly")
+        
+        with patch.object(alert_service, "cache") as mock_cache:
+            touched = BudgetService.apply_spending_batch(db_session, test_user.id, [
+                {"category": "dining", "amount": -50.00},
+                {"category": "dining", "amount": -35.00},
+                {"category": "dining", "amount": -30.00}
+            ])
+            BudgetService.evaluate_thresholds(db_session, test_user.id, touched)
+            BudgetService.evaluate_thresholds(db_session, test_user.id, touched)
+        
+        assert mock_cache.stream_add.call_count == 1
+        published = [
+            message for call in mock_cache.stream_add.call_args_list for message in call.args[1]
+        ]
+        assert [a["alert_type"] for a in published] == ["exceeded"]
+        db_session.refresh(budget)
+        assert budget.alert_sent is True
+        assert budget.warning_sent is True
+    
+    def test_warning_sent_once_per_period(self, db_session, test_user):
+        from unittest.mock import patch
+        from app.services import alert_service
+        
+        BudgetService.create_budget(db_session, test_user.id, "groceries", 100.00, "monthly")
+        BudgetService.create_budget(db_session, test_user.id, "travel", 100.00, "monthly")
+        
+        with patch.object(alert_service, "cache") as mock_cache:
+            BudgetService.update_budget_spending(db_session, test_user.id, "groceries", -85.00)
+            BudgetService.update_budget_spending(db_session, test_user.id, "groceries", -5.00)
+            BudgetService.update_budget_spending(db_session, test_user.id, "travel", -90.00)
+            BudgetService.update_budget_spending(db_session, test_user.id, "groceries", -20.00)
+        
+        published = [
+            (a["category"], a["alert_type"])
+            for call in mock_cache.stream_add.call_args_list for a in call.args[1]
+        ]
+        assert published == [("groceries", "warning"), ("travel", "warning"), ("groceries", "exceeded")]
+    
+    def test_sync_evaluates_thresholds_once(self, db_session, test_user, test_account):
+        from unittest.mock import patch
+        from app.services import alert_service
+        from app.services.sync_service import SyncService
+        from app.providers.base_provider import TransactionPage
+        
+        BudgetService.create_budget(db_session, test_user.id, "dining", 100.00, "monthly")
+        now = datetime.now(timezone.utc).isoformat()
+        raw = [
+            {"id": f"ALERT_{i}", "date": now, "amount": -30.00,
+             "description": f"Restaurant dinner {i}", "merchant": "Bistro"}
+            for i in range(5)
+        ]
+        # The first page alone crosses the warning level, the second the limit
+        pages = [TransactionPage(transactions=raw[:3]), TransactionPage(transactions=raw[3:])]
+        
+        with patch.object(BudgetService, "evaluate_thresholds", wraps=BudgetService.evaluate_thresholds) as evaluate, \
+             patch.object(alert_service, "cache") as mock_cache:
+            result = SyncService.sync_account(db_session, test_account.id, pages=pages)
+        
+        assert result["records_inserted"] == 5
+        evaluate.assert_called_once()
+        assert evaluate.call_args.args[2] == {"dining"}
+        published = [a for call in mock_cache.stream_add.call_args_list for a in call.args[1]]
+        assert [(a["alert_type"], a["current_spend"]) for a in published] == [("exceeded", 150.00)]
+
 class TestBudgetEndpoints:
     
     def test_create_budget_endpoint(self, client, auth_headers):
@@ -128,3 +281,131 @@ class TestBudgetEndpoints:
         
         deleted = db_session.query(Budget).filter(Budget.id == budget.id).first()
         assert deleted is None
+
+class TestBudgetLedger:
+    
+    def add_spend(self, db_session, account_id, category, amount, date, suffix):
+        from app.models.transaction import Transaction
+        txn = Transaction(
+            account_id=account_id,
+            provider_txn_id=f"LEDGER_{suffix}",
+            date=date,
+            amount=amount,
+            description="Ledger spend",
+            merchant="Store",
+            category=category,
+            hash=f"ledger_{suffix}"
+        )
+        db_session.add(txn)
+        db_session.commit()
+        return txn
+    
+    def test_calendar_period_bounds(self):
+        from app.services.budget_ledger_service import BudgetLedgerService
+        
+        at = datetime(2024, 12, 18, 15, 30, tzinfo=timezone.utc)  # a Wednesday
+        assert BudgetLedgerService.period_bounds(BudgetPeriod.WEEKLY, at) == (
+            datetime(2024, 12, 16, tzinfo=timezone.utc), datetime(2024, 12, 23, tzinfo=timezone.utc)
+        )
+        assert BudgetLedgerService.period_bounds(BudgetPeriod.MONTHLY, at) == (
+            datetime(2024, 12, 1, tzinfo=timezone.utc), datetime(2025, 1, 1, tzinfo=timezone.utc)
+        )
+    
+    def test_spend_recomputed_from_ledger(self, db_session, test_user, test_account):
+        from app.services.budget_ledger_service import BudgetLedgerService
+        
+        BudgetService.create_budget(db_session, test_user.id, "dining", 300.00, "monthly")
+        at = datetime(2024, 3, 15, tzinfo=timezone.utc)
+        self.add_spend(db_session, test_account.id, "dining", -40.00, datetime(2024, 3, 1, tzinfo=timezone.utc), 1)
+        self.add_spend(db_session, test_account.id, "dining", -25.50, datetime(2024, 3, 31, 23, tzinfo=timezone.utc), 2)
+        self.add_spend(db_session, test_account.id, "dining", 10.00, datetime(2024, 3, 10, tzinfo=timezone.utc), 3)
+        self.add_spend(db_session, test_account.id, "dining", -99.00, datetime(2024, 4, 1, tzinfo=timezone.utc), 4)
+        self.add_spend(db_session, test_account.id, "travel", -80.00, datetime(2024, 3, 5, tzinfo=timezone.utc), 5)
+        
+        spend = BudgetLedgerService.get_period_spend(db_session, test_user.id, BudgetPeriod.MONTHLY, at)
+        assert spend == {"dining": 65.50}
+        
+        report = BudgetLedgerService.get_report(db_session, test_user.id, at)
+        assert report[0]["spent"] == 65.50
+        assert report[0]["period_start"].startswith("2024-03-01")
+    
+    def test_reconciliation_invalidates_only_affected_period(self, db_session, test_user, test_account):
+        from unittest.mock import patch
+        from app.services import budget_ledger_service
+        from app.services.reconciliation_service import ReconciliationService
+        from app.schemas.transaction_schemas import TransactionReconcile
+        
+        txn = self.add_spend(
+            db_session, test_account.id, "dining", -40.00, datetime(2024, 3, 13, tzinfo=timezone.utc), 1
+        )
+        
+        with patch.object(budget_ledger_service, "cache") as mock_cache:
+            ReconciliationService.reconcile_transaction(
+                db_session, txn.id, TransactionReconcile(amount=-45.00, reason="fix"), test_user.id
+            )
+        
+        mock_cache.delete_many.assert_called_once()
+        deleted = sorted(mock_cache.delete_many.call_args.args[0])
+        assert deleted == [
+            f"user:{test_user.id}:budget_spend:monthly:2024-03-01",
+            f"user:{test_user.id}:budget_spend:weekly:2024-03-11"
+        ]
+        mock_cache.invalidate_tags.assert_not_called()
+    
+    def test_current_spend_tracks_ledger(self, db_session, test_user, test_account):
+        from app.services.budget_ledger_service import BudgetLedgerService
+        from app.services.reconciliation_service import ReconciliationService
+        from app.schemas.transaction_schemas import TransactionReconcile
+        
+        now = datetime.now(timezone.utc)
+        self.add_spend(db_session, test_account.id, "dining", -30.00, now, 1)
+        dining = BudgetService.create_budget(db_session, test_user.id, "dining", 100.00, "monthly")
+        groceries = BudgetService.create_budget(db_session, test_user.id, "groceries", 100.00, "monthly")
+        assert dining.current_spend == 30.00
+        
+        txn = self.add_spend(db_session, test_account.id, "dining", -50.00, now, 2)
+        old = self.add_spend(db_session, test_account.id, "dining", -70.00, now - timedelta(days=62), 3)
+        BudgetService.apply_spending_batch(db_session, test_user.id, [
+            {"category": "dining", "amount": -50.00, "date": txn.date},
+            {"category": "dining", "amount": -70.00, "date": old.date}
+        ])
+        ReconciliationService.reconcile_transaction(
+            db_session, txn.id, TransactionReconcile(amount=-45.00, category="groceries", reason="fix"),
+            test_user.id
+        )
+        
+        db_session.refresh(dining)
+        db_session.refresh(groceries)
+        ledger = BudgetLedgerService.compute_period_spend(db_session, test_user.id, BudgetPeriod.MONTHLY)
+        assert (dining.current_spend, groceries.current_spend) == (30.00, 45.00)
+        assert ledger == {"dining": 30.00, "groceries": 45.00}
+    
+    def test_provider_correction_updates_current_spend(self, db_session, test_user, test_account):
+        from app.services.sync_service import SyncService
+        from app.services.budget_ledger_service import BudgetLedgerService
+        
+        dining = BudgetService.create_budget(db_session, test_user.id, "dining", 100.00, "monthly")
+        row = {
+            "id": "txn_coffee",
+            "date": datetime.now(timezone.utc).replace(tzinfo=None).isoformat(),
+            "amount": -40.00,
+            "description": "Starbucks coffee",
+            "merchant": "Starbucks"
+        }
+        SyncService.sync_account(db_session, test_account.id, [row])
+        result = SyncService.sync_account(db_session, test_account.id, [{**row, "amount": -90.00}])
+        
+        assert result["records_updated"] == 1
+        db_session.refresh(dining)
+        ledger = BudgetLedgerService.compute_period_spend(db_session, test_user.id, BudgetPeriod.MONTHLY)
+        assert dining.current_spend == ledger["dining"] == 90.00
+    
+    def test_budget_spend_endpoint(self, client, auth_headers, db_session, test_user, test_account):
+        BudgetService.create_budget(db_session, test_user.id, "groceries", 200.00, "weekly")
+        self.add_spend(db_session, test_account.id, "groceries", -50.00, datetime.now(timezone.utc), 1)
+        
+        response = client.get("/budgets/spend", headers=auth_headers)
+        assert response.status_code == status.HTTP_200_OK
+        budget = response.json()["budgets"][0]
+        assert budget["spent"] == 50.00
+        assert budget["percentage_used"] == 25.0
@@ -0,0 +1,356 @@
+import pytest
+import json
+import time
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+from app.cache import RedisCache, INVALIDATION_CHANNEL, EXTEND_TTL_SCRIPT
+from app.core.lru_cache import LRUCache
+from app.core.serializers import Serializer, FORMATS, COMPRESSIONS
+from app.config import get_settings
+
+@pytest.fixture
+def two_tier():
+    tiered = RedisCache(local_size=10, local_ttl=5)
+    tiered.client = tiered.binary_client = MagicMock()
+    with patch.object(tiered, "_ensure_listener"):
+        yield tiered
+
+class TestTwoTierCache:
+    
+    def test_hot_key_served_from_local_tier(self, two_tier):
+        two_tier.client.get.return_value = json.dumps([{"id": 1}])
+        
+        assert two_tier.get("user:1:accounts") == [{"id": 1}]
+        assert two_tier.get("user:1:accounts") == [{"id": 1}]
+        
+        assert two_tier.client.get.call_count == 1
+        stats = two_tier.stats()
+        assert stats["local"]["hits"] == 1
+        assert stats["local"]["misses"] == 1
+        assert stats["redis"]["hits"] == 1
+    
+    def test_writes_invalidate_other_workers(self, two_tier):
+        two_tier.set("user:1:accounts", [{"id": 1}])
+        two_tier.delete("user:2:accounts")
+        two_tier.invalidate_pattern("account:3:*")
+        
+        pipe = two_tier.client.pipeline.return_value
+        messages = [
+            json.loads(call.args[1])
+            for call in pipe.publish.call_args_list + two_tier.client.publish.call_args_list
+            if call.args[0] == INVALIDATION_CHANNEL
+        ]
+        assert [(m["keys"], m["patterns"]) for m in messages] == [
+            (["user:1:accounts"], []),
+            (["user:2:accounts"], []),
+            ([], ["account:3:*"])
+        ]
+        assert two_tier.get("user:1:accounts") == [{"id": 1}]
+        two_tier.client.get.assert_not_called()
+    
+    def test_first_fill_does_not_broadcast(self, two_tier):
+        two_tier.client.get.return_value = None
+        two_tier.client.set.return_value = True
+        
+        two_tier.get_or_compute("user:1:accounts", lambda: [{"id": 1}])
+        two_tier.set("user:2:accounts", [{"id": 2}], overwrite=False)
+        
+        pipe = two_tier.client.pipeline.return_value
+        pipe.publish.assert_not_called()
+        two_tier.client.publish.assert_not_called()
+        assert two_tier.local.get("user:2:accounts") == [{"id": 2}]
+    
+    def test_remote_invalidation_drops_local_entries(self, two_tier):
+        two_tier.local.set("user:1:accounts", ["stale"])
+        two_tier.local.set("user:1:budget_spend:monthly:2024-03-01", {"dining": 1.0})
+        two_tier.local.set("user:2:accounts", ["kept"])
+        
+        two_tier._handle_invalidation({"data": json.dumps({
+            "origin": "other-worker", "keys": ["user:1:accounts"], "patterns": ["user:1:*"]
+        })})
+        
+        assert len(two_tier.local) == 1
+        assert two_tier.local.get("user:2:accounts") == ["kept"]
+    
+    def test_own_invalidations_ignored(self, two_tier):
+        two_tier.local.set("user:1:accounts", ["fresh"])
+        
+        two_tier._handle_invalidation({"data": json.dumps({
+            "origin": two_tier._instance_id, "keys": ["user:1:accounts"], "patterns": []
+        })})
+        
+        assert two_tier.local.get("user:1:accounts") == ["fresh"]
+    
+    def test_local_tier_disabled(self):
+        single = RedisCache(local_size=0)
+        single.client = single.binary_client = MagicMock()
+        single.client.get.return_value = json.dumps({"a": 1})
+        
+        single.get("k")
+        single.get("k")
+        
+        assert single.local is None
+        assert single.client.get.call_count == 2
+        assert single.stats()["local"] is None
+    
+    def test_lru_entries_expire(self):
+        lru = LRUCache(maxsize=4, ttl=60)
+        lru.set("short", 1, ttl=0.01)
+        lru.set("long", 2)
+        time.sleep(0.02)
+        
+        assert lru.get("short") is None
+        assert lru.get("long") == 2
+    
+    def test_set_registers_namespace_tag(self, two_tier):
+        pipe = two_tier.client.pipeline.return_value
+        
+        two_tier.set("user:1:accounts", [{"id": 1}], ttl=60)
+        
+        key, ttl, payload = pipe.setex.call_args.args
+        assert (key, ttl, Serializer.loads(payload)) == ("user:1:accounts", 60, [{"id": 1}])
+        pipe.sadd.assert_called_once_with("tag:user:1", "user:1:accounts")
+        pipe.eval.assert_called_once_with(EXTEND_TTL_SCRIPT, 1, "tag:user:1", 60)
+        assert pipe.execute.call_count == 1
+    
+    def test_invalidate_tags_in_one_round_trip(self, two_tier):
+        pipe = two_tier.client.pipeline.return_value
+        two_tier.local.set("user:1:accounts", ["cached"])
+        two_tier.local.set("account:5:summary", ["cached"])
+        two_tier.local.set("user:2:accounts", ["kept"])
+        
+        two_tier.invalidate_tags("account:5", "user:1")
+        
+        assert pipe.eval.call_args.args[1:] == (2, "tag:account:5", "tag:user:1")
+        assert json.loads(pipe.publish.call_args.args[1])["patterns"] == ["account:5:*", "user:1:*"]
+        assert pipe.execute.call_count == 1
+        two_tier.client.scan_iter.assert_not_called()
+        assert len(two_tier.local) == 1
+
+class TestBatchedOperations:
+    
+    def test_acquire_locks_is_one_round_trip(self, two_tier):
+        pipe = two_tier.client.pipeline.return_value
+        pipe.execute.return_value = [True, None, True]
+        
+        acquired = two_tier.acquire_locks(["sync_account:1", "sync_account:2", "sync_account:3"], timeout=60)
+        
+        assert acquired == ["sync_account:1", "sync_account:3"]
+        pipe.set.assert_any_call("lock:sync_account:2", "1", nx=True, ex=60)
+        assert pipe.execute.call_count == 1
+    
+    def test_mset_shares_tag_writes_and_broadcast(self, two_tier):
+        pipe = two_tier.client.pipeline.return_value
+        
+        two_tier.mset({"user:1:accounts": [1], "user:1:budgets": [2]}, ttl=60)
+        
+        assert pipe.setex.call_count == 2
+        pipe.sadd.assert_called_once_with("tag:user:1", "user:1:accounts", "user:1:budgets")
+        assert json.loads(pipe.publish.call_args.args[1])["keys"] == ["user:1:accounts", "user:1:budgets"]
+        assert pipe.execute.call_count == 1
+        assert two_tier.local.get("user:1:budgets") == [2]
+    
+    def test_delete_many_is_one_command(self, two_tier):
+        pipe = two_tier.client.pipeline.return_value
+        two_tier.local.set("a:1:x", 1)
+        two_tier.local.set("a:2:x", 2)
+        
+        two_tier.delete_many(["a:1:x", "a:2:x"])
+        
+        pipe.delete.assert_called_once_with("a:1:x", "a:2:x")
+        assert pipe.execute.call_count == 1
+        assert len(two_tier.local) == 0
+    
+    def test_operations_join_callers_pipeline(self, two_tier):
+        pipe = two_tier.client.pipeline.return_value
+        
+        with two_tier.pipeline() as batch:
+            two_tier.stream_add("alerts:stream", [{"a": 1}, {"a": 2}], pipe=batch)
+            two_tier.invalidate_tags("account:5", pipe=batch)
+            two_tier.release_lock("sync_account:5", pipe=batch)
+            pipe.execute.assert_not_called()
+        
+        assert pipe.xadd.call_count == 2
+        pipe.delete.assert_called_once_with("lock:sync_account:5")
+        assert pipe.execute.call_count == 1
+        two_tier.client.delete.assert_not_called()
+    
+    def test_pipeline_flushes_when_block_raises(self, two_tier):
+        pipe = two_tier.client.pipeline.return_value
+        
+        with pytest.raises(RuntimeError):
+            with two_tier.pipeline() as batch:
+                two_tier.delete("user:1:accounts", pipe=batch)
+                raise RuntimeError("sync failed")
+        
+        assert pipe.execute.call_count == 1
+    
+    def test_pipeline_errors_are_logged(self, two_tier):
+        two_tier.client.pipeline.return_value.execute.side_effect = ConnectionError("redis down")
+        
+        with patch("app.cache.logger") as logger:
+            two_tier.delete_many(["user:1:accounts"])
+            two_tier.stream_add("alerts:stream", [{"a": 1}])
+        
+        assert logger.error.call_count == 2
+        assert "redis down" in logger.error.call_args.args[0]
+
+class TestGetOrCompute:
+    
+    def envelope(self, value, fresh_for, delta=0.01):
+        return json.dumps({"value": value, "delta": delta, "fresh_until": time.time() + fresh_for})
+    
+    def test_cold_miss_computes_and_caches(self, two_tier):
+        two_tier.client.get.return_value = None
+        two_tier.client.set.return_value = True
+        compute = MagicMock(return_value=[1, 2])
+        
+        assert two_tier.get_or_compute("user:1:accounts", compute, ttl=30) == [1, 2]
+        assert two_tier.get_or_compute("user:1:accounts", compute, ttl=30) == [1, 2]
+        
+        compute.assert_called_once()
+        pipe = two_tier.client.pipeline.return_value
+        key, ttl, payload = pipe.setex.call_args.args
+        assert ttl == 30 + get_settings().CACHE_STALE_TTL_SECONDS
+        assert Serializer.loads(payload)["value"] == [1, 2]
+    
+    def test_plain_entry_treated_as_miss(self, two_tier):
+        two_tier.client.get.return_value = json.dumps({"dining": 12.5})
+        two_tier.client.set.return_value = True
+        
+        assert two_tier.get_or_compute("user:1:budget_spend", lambda: {"dining": 20.0}) == {"dining": 20.0}
+        pipe = two_tier.client.pipeline.return_value
+        assert Serializer.loads(pipe.setex.call_args.args[2])["value"] == {"dining": 20.0}
+    
+    def test_stale_value_served_while_other_worker_refreshes(self, two_tier):
+        two_tier.client.get.return_value = self.envelope(["old"], fresh_for=-5)
+        two_tier.client.set.return_value = None  # refresh lock held elsewhere
+        compute = MagicMock(return_value=["new"])
+        
+        assert two_tier.get_or_compute("user:1:accounts", compute) == ["old"]
+        compute.assert_not_called()
+    
+    def test_stale_value_refreshed_by_lock_holder(self, two_tier):
+        two_tier.client.get.return_value = self.envelope(["old"], fresh_for=-5)
+        two_tier.client.set.return_value = True
+        
+        assert two_tier.get_or_compute("user:1:accounts", lambda: ["new"]) == ["new"]
+        pipe = two_tier.client.pipeline.return_value
+        pipe.delete.assert_called_with("lock:compute:user:1:accounts")
+        assert pipe.execute.call_count == 1
+    
+    def test_early_refresh_near_expiry(self, two_tier):
+        two_tier.client.set.return_value = True
+        compute = MagicMock(return_value=["new"])
+        
+        two_tier.client.get.return_value = self.envelope(["old"], fresh_for=0.5, delta=10)
+        with patch("app.cache.random.random", return_value=0.5):
+            assert two_tier.get_or_compute("user:1:accounts", compute) == ["new"]
+        
+        two_tier.local.clear()
+        two_tier.client.get.return_value = self.envelope(["old"], fresh_for=300, delta=0.01)
+        with patch("app.cache.random.random", return_value=0.5):
+            assert two_tier.get_or_compute("user:2:accounts", compute) == ["old"]
+        compute.assert_called_once()
+    
+    def test_cold_miss_waits_for_lock_holder_signal(self, two_tier):
+        # A miss, then the other worker's result once it signals
+        two_tier.client.get.side_effect = [None, self.envelope(["theirs"], fresh_for=30)]
+        two_tier.client.set.return_value = None  # compute lock held by another worker
+        two_tier.client.blpop.return_value = ("computed:user:1:accounts", "1")
+        compute = MagicMock(return_value=["ours"])
+        
+        with patch("app.cache.time.sleep") as sleep:
+            assert two_tier.get_or_compute("user:1:accounts", compute) == ["theirs"]
+        
+        compute.assert_not_called()
+        sleep.assert_not_called()
+        assert two_tier.client.blpop.call_args.kwargs["timeout"] == get_settings().CACHE_COMPUTE_WAIT_MS / 1000
+        two_tier.client.pipeline.return_value.rpush.assert_called_with("computed:user:1:accounts", 1)
+    
+    def test_cold_miss_computes_after_wait_cap(self, two_tier):
+        two_tier.client.get.return_value = None
+        two_tier.client.set.return_value = None
+        two_tier.client.blpop.return_value = None  # holder did not finish within the cap
+        
+        assert two_tier.get_or_compute("user:1:accounts", lambda: ["ours"]) == ["ours"]
+        assert two_tier.client.blpop.call_count == 1
+    
+    def test_lock_holder_signals_waiters(self, two_tier):
+        two_tier.client.get.return_value = None
+        two_tier.client.set.return_value = True
+        
+        two_tier.get_or_compute("user:1:accounts", lambda: ["ours"])
+        
+        pipe = two_tier.client.pipeline.return_value
+        pipe.rpush.assert_called_once_with("computed:user:1:accounts", 1)
+        pipe.pexpire.assert_called_once_with("computed:user:1:accounts", get_settings().CACHE_COMPUTE_WAIT_MS)
+        assert pipe.execute.call_count == 1
+    
+    def test_concurrent_misses_share_one_computation(self, two_tier):
+        import threading
+        
+        two_tier.client.get.return_value = None
+        two_tier.client.set.side_effect = ConnectionError("redis down")
+        release = threading.Event()
+        calls = []
+        
+        def compute():
+            calls.append(1)
+            release.wait(2)
+            return {"spend": 1}
+        
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(two_tier.get_or_compute("user:1:x", compute)))
+            for _ in range(5)
+        ]
+        for t in threads:
+            t.start()
+        time.sleep(0.1)
+        release.set()
+        for t in threads:
+            t.join()
+        
+        assert len(calls) == 1
+        assert results == [{"spend": 1}] * 5
+
+class TestSerializers:
+    
+    PAYLOAD = {
+        "accounts": [{"id": i, "name": f"Checking {i}", "balance": 1000.5 + i} for i in range(50)],
+        "synced": datetime(2024, 3, 1, 12, 30, tzinfo=timezone.utc)
+    }
+    
+    @pytest.mark.parametrize("fmt", list(FORMATS))
+    @pytest.mark.parametrize("compression", list(COMPRESSIONS))
+    def test_round_trip(self, fmt, compression):
+        if not (FORMATS[fmt][3] and COMPRESSIONS[compression][3]):
+            pytest.skip(f"{fmt}+{compression} not installed")
+        serializer = Serializer(fmt, compression, compress_min_bytes=64)
+        
+        data = serializer.dumps(self.PAYLOAD)
+        
+        assert data[0] == FORMATS[fmt][0]
+        assert data[1] == COMPRESSIONS[compression][0]
+        decoded = Serializer.loads(data)
+        assert decoded["accounts"] == self.PAYLOAD["accounts"]
+        assert decoded["synced"] == "2024-03-01T12:30:00+00:00"
+    
+    def test_small_payloads_not_compressed(self):
+        serializer = Serializer("json", "zlib", compress_min_bytes=1024)
+        data = serializer.dumps({"a": 1})
+        assert data[1] == 0
+        assert Serializer.loads(data) == {"a": 1}
+    
+    def test_legacy_json_entries_still_decode(self):
+        assert Serializer.loads(b'[{"id": 1}]') == [{"id": 1}]
+        assert Serializer.loads(b'"text"') == "text"
+    
+    def test_truncated_header_rejected(self):
+        with pytest.raises(ValueError):
+            Serializer.loads(bytes((FORMATS["json"][0],)))
+    
+    def test_unknown_codec_rejected(self):
+        with pytest.raises(ValueError):
+            Serializer("pickle")
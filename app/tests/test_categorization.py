@@ -9,4 +9,150 @@ def test_categorization():
     assert category == "dining"
     
     category = CategorizationService.categorize("Salary Deposit", "Employer", 3000.0)
-    assert category == "income"
\ No newline at end of file
+    assert category == "income"
+
+def _reference_categorize(description, merchant, amount):
+    rules = CategorizationService.RULES
+    desc_lower = description.lower()
+    merchant_lower = (merchant or "").lower()
+    
+    if amount > 0:
+        if any(k in desc_lower for k in rules["income"]["keywords"]):
+            return "income"
+        if amount >= rules["income"]["amount_threshold"]:
+            return "income"
+    
+    for category, category_rules in rules.items():
+        if category == "income":
+            continue
+        if any(k in desc_lower or k in merchant_lower for k in category_rules.get("keywords", [])):
+            return category
+        if any(m in merchant_lower for m in category_rules.get("merchants", [])):
+            return category
+    return "other"
+
+def test_compiled_matcher_matches_reference_rules():
+    samples = [
+        ("Shell gas station cafe", "Shell", -40.0),
+        ("Uber Eats", "Uber Eats", -25.0),
+        ("AMAZON PRIME VIDEO", None, -14.99),
+        ("Payroll ACME", "ACME", 1200.0),
+        ("Refund", "Walmart.com", 35.0),
+        ("Large transfer", None, 900.0),
+        ("CVS Pharmacy #123", "CVS", -12.0),
+        ("Misc", "Unknown", -3.0),
+        ("", None, -1.0),
+    ]
+    for description, merchant, amount in samples:
+        assert CategorizationService.categorize(description, merchant, amount) == \
+            _reference_categorize(description, merchant, amount), description
+
+def test_compile_rules_rebuilds_matcher():
+    original = CategorizationService.RULES
+    try:
+        CategorizationService.compile_rules({
+            "pets": {"keywords": ["petco"], "merchants": []},
+            "income": {"keywords": ["salary"], "amount_threshold": 500}
+        })
+        assert CategorizationService.categorize("PETCO #42", None, -30.0) == "pets"
+        assert CategorizationService.categorize("Whole Foods", None, -30.0) == "other"
+    finally:
+        CategorizationService.compile_rules(original)
+    
+    assert CategorizationService.categorize("Whole Foods", None, -30.0) == "groceries"
+
+def test_categorize_memoizes_repeated_merchants():
+    CategorizationService.compile_rules()
+    before = CategorizationService.cache_stats()
+    
+    for _ in range(5):
+        assert CategorizationService.categorize("STARBUCKS #1", "Starbucks", -4.5) == "dining"
+    assert CategorizationService.categorize("starbucks #1", "STARBUCKS", -4.5) == "dining"
+    
+    after = CategorizationService.cache_stats()
+    assert after["misses"] - before["misses"] == 1
+    assert after["hits"] - before["hits"] == 5
+
+def test_memo_keeps_income_threshold_buckets_apart():
+    assert CategorizationService.categorize("Refund", "Store", 20.0) == "other"
+    assert CategorizationService.categorize("Refund", "Store", 800.0) == "income"
+    assert CategorizationService.categorize("Refund", "Store", -20.0) == "other"
+
+def test_lru_cache_evicts_least_recently_used():
+    from app.core.lru_cache import LRUCache
+    
+    lru = LRUCache(maxsize=2)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    assert lru.get("a") == 1
+    lru.set("c", 3)
+    
+    assert lru.get("b") is None
+    assert lru.get("a") == 1
+    assert lru.get("c") == 3
+    assert lru.stats()["size"] == 2
+
+def test_rules_loaded_from_categories_table(db_session):
+    from app.models.category import Category
+    
+    db_session.add(Category(name="pets", keywords="petco, pet supplies", merchants="Chewy"))
+    db_session.add(Category(name="other", description="No rules"))
+    db_session.commit()
+    
+    try:
+        assert CategorizationService.refresh_rules(db_session, force=True)
+        assert CategorizationService.categorize("PETCO #42", None, -30.0) == "pets"
+        assert CategorizationService.categorize("Order", "chewy.com", -30.0) == "pets"
+        assert CategorizationService.categorize("Whole Foods", None, -30.0) == "groceries"
+        assert CategorizationService.categorize("Salary", None, 3000.0) == "income"
+    finally:
+        CategorizationService.compile_rules(CategorizationService.DEFAULT_RULES)
+
+def test_empty_categories_table_falls_back_to_builtin_rules(db_session):
+    assert CategorizationService.refresh_rules(db_session, force=True)
+    assert CategorizationService.RULES is CategorizationService.DEFAULT_RULES
+    assert CategorizationService.categorize("Whole Foods", None, -30.0) == "groceries"
+
+def test_category_rows_override_builtin_rules_per_category(db_session):
+    from app.models.category import Category
+    
+    db_session.add(Category(name="groceries", keywords="farmers market"))
+    db_session.commit()
+    
+    try:
+        assert CategorizationService.refresh_rules(db_session, force=True)
+        assert CategorizationService.categorize("Farmers Market", None, -20.0) == "groceries"
+        assert CategorizationService.categorize("Kroger", None, -20.0) == "other"
+        assert CategorizationService.categorize("Order", "Costco", -20.0) == "groceries"
+        assert CategorizationService.categorize("Starbucks", "Starbucks", -5.0) == "dining"
+        assert CategorizationService.DEFAULT_RULES["groceries"]["keywords"][0] == "grocery"
+    finally:
+        CategorizationService.compile_rules(CategorizationService.DEFAULT_RULES)
+
+def test_categories_are_read_only_over_the_api(client, auth_headers):
+    response = client.post("/categories/", headers=auth_headers, json={"name": "pets", "keywords": ["petco"]})
+    assert response.status_code == 405
+
+def test_category_edits_reload_without_version_bump(db_session):
+    from unittest.mock import patch
+    from app.models.category import Category
+    from app.services import categorization_service
+    
+    pets = Category(name="pets", keywords="petco")
+    db_session.add(pets)
+    db_session.commit()
+    
+    try:
+        with patch.object(categorization_service.settings, "CATEGORY_RULES_REFRESH_SECONDS", 0), \
+             patch.object(categorization_service.cache, "get", return_value=None):
+            assert CategorizationService.refresh_rules(db_session, force=True)
+            assert not CategorizationService.refresh_rules(db_session)
+            
+            pets.keywords = "chewy"
+            db_session.commit()
+            
+            assert CategorizationService.refresh_rules(db_session)
+            assert CategorizationService.categorize("Chewy order", None, -30.0) == "pets"
+            assert CategorizationService.categorize("PETCO #42", None, -30.0) == "other"
+    finally:
+        CategorizationService.compile_rules(CategorizationService.DEFAULT_RULES)
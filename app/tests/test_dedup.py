@@ -9,4 +9,30 @@ def test_transaction_hash():
     hash3 = generate_transaction_hash(date, -50.0, "Different Store", "banka")
     
     assert hash1 == hash2  
-    assert hash1 != hash3 
\ No newline at end of file
+    assert hash1 != hash3 
+
+def test_find_existing_batch(db_session, test_account):
+    from app.models.transaction import Transaction
+    from app.services.dedup_service import DeduplicationService
+    
+    for i in range(3):
+        db_session.add(Transaction(
+            account_id=test_account.id,
+            provider_txn_id=f"TXN_{i}",
+            date=datetime(2024, 1, i + 1),
+            amount=-10.0 * (i + 1),
+            description="Store",
+            hash=f"batch_hash_{i}"
+        ))
+    db_session.commit()
+    
+    hashes, by_provider_id = DeduplicationService.find_existing_batch(
+        db_session,
+        ["batch_hash_0", "batch_hash_2", "unknown_hash"],
+        ["TXN_1", "TXN_2", "TXN_9", None],
+        test_account.id
+    )
+    
+    assert hashes == {"batch_hash_0", "batch_hash_2"}
+    assert set(by_provider_id) == {"TXN_1", "TXN_2"}
+    assert by_provider_id["TXN_1"].amount == -20.0
@@ -4,6 +4,9 @@ from fastapi import status
 from app.services.sync_service import SyncService
 from app.models.transaction import Transaction
 from app.models.sync_cursor import SyncCursor
+from app.providers.base_provider import BaseProvider, TransactionPage
+from app.providers.provider_registry import provider_registry
+from unittest.mock import patch
 
 class TestSyncService:
     
@@ -55,6 +58,21 @@ class TestSyncService:
         assert cursor.status == "success"
         assert cursor.duration_seconds > 0
     
+    def test_sync_records_stage_timings(self, db_session, test_account):
+        SyncService.sync_account(db_session, test_account.id)
+        
+        cursor = db_session.query(SyncCursor).filter(
+            SyncCursor.account_id == test_account.id
+        ).first()
+        
+        stages = cursor.meta_info["stages"]
+        for name in ("fetch", "normalize", "hash", "dedup", "categorize",
+                     "db_write", "budget_update", "cache_invalidation"):
+            assert name in stages
+            assert stages[name]["seconds"] >= 0
+        assert stages["fetch"]["count"] == 1
+        assert stages["categorize"]["count"] == 1
+    
     def test_sync_deduplicates_transactions(self, db_session, test_account):
         result1 = SyncService.sync_account(db_session, test_account.id)
         records_first = result1["records_inserted"]
@@ -74,6 +92,202 @@ class TestSyncService:
         categorized = [t for t in transactions if t.category is not None]
         assert len(categorized) > 0
 
+    def test_sync_logs_create_audit_rows(self, db_session, test_account):
+        from app.models.audit_log import AuditLog
+        
+        result = SyncService.sync_account(db_session, test_account.id)
+        
+        transactions = db_session.query(Transaction).filter(
+            Transaction.account_id == test_account.id
+        ).all()
+        audit_logs = db_session.query(AuditLog).filter(
+            AuditLog.action == "create"
+        ).all()
+        
+        assert len(transactions) == result["records_inserted"]
+        assert {log.transaction_id for log in audit_logs} == {t.id for t in transactions}
+    
+    def test_provider_correction_audited_with_page(self, db_session, test_account):
+        from app.models.audit_log import AuditLog
+        from app.services.delta_history_service import DeltaHistoryService
+        
+        row = {"id": "txn_1", "date": "2023-01-01T12:00:00", "amount": -50.0,
+               "description": "Test Transaction", "merchant": "Test Merchant"}
+        SyncService.sync_account(db_session, test_account.id, [row])
+        
+        with patch.object(DeltaHistoryService, "log_change") as log_change:
+            result = SyncService.sync_account(db_session, test_account.id, [{**row, "amount": -65.0}])
+        
+        log_change.assert_not_called()
+        assert result["records_updated"] == 1
+        correction = db_session.query(AuditLog).filter(AuditLog.action == "correction").one()
+        assert (correction.old_value, correction.new_value) == ("-50.0", "-65.0")
+        assert correction.reason == "Provider correction"
+    
+    def test_bulk_insert_transactions_returns_ids(self, db_session, test_account):
+        rows = [
+            {
+                "account_id": test_account.id,
+                "provider_txn_id": f"BULK_{i}",
+                "date": datetime(2024, 1, i + 1),
+                "amount": -5.0,
+                "description": "Bulk",
+                "merchant": None,
+                "category": "other",
+                "hash": f"bulk_hash_{i}"
+            }
+            for i in range(5)
+        ]
+        
+        ids_by_hash = SyncService.bulk_insert_transactions(db_session, rows)
+        db_session.commit()
+        
+        assert len(ids_by_hash) == 5
+        for txn_hash, txn_id in ids_by_hash.items():
+            txn = db_session.query(Transaction).filter(Transaction.id == txn_id).one()
+            assert txn.hash == txn_hash
+            assert txn.status == "posted"
+
+class PagedProvider(BaseProvider):
+    PAGES = {
+        None: (["P1", "P2"], "cursor-2"),
+        "cursor-2": (["P3"], "cursor-3"),
+        "cursor-3": (["P4"], "cursor-final")
+    }
+    
+    def __init__(self, fail_on_cursor=None):
+        self.fail_on_cursor = fail_on_cursor
+        self.requested_cursors = []
+    
+    def get_provider_id(self) -> str:
+        return "test_provider"
+    
+    def get_provider_name(self) -> str:
+        return "Paged Test Provider"
+    
+    def fetch_accounts(self, token):
+        return []
+    
+    def fetch_transactions(self, token, account_id, since_date=None):
+        return []
+    
+    def fetch_transactions_page(self, token, account_id, cursor=None, since_date=None):
+        self.requested_cursors.append(cursor)
+        if cursor is not None and cursor == self.fail_on_cursor:
+            raise ConnectionError("provider timeout")
+        
+        txn_ids, next_cursor = self.PAGES[cursor]
+        return TransactionPage(
+            transactions=[
+                {
+                    "id": txn_id,
+                    "date": f"2024-01-0{i + 1}T12:00:00",
+                    "amount": -10.0,
+                    "description": f"Paged {txn_id}",
+                    "merchant": "Store"
+                }
+                for i, txn_id in enumerate(txn_ids)
+            ],
+            next_cursor=next_cursor,
+            has_more=next_cursor != "cursor-final"
+        )
+
+class TestPaginatedSync:
+    
+    def test_sync_consumes_all_pages(self, db_session, test_account):
+        provider = PagedProvider()
+        with patch.dict(provider_registry._providers, {"test_provider": provider}):
+            result = SyncService.sync_account(db_session, test_account.id)
+        
+        db_session.refresh(test_account)
+        assert result["records_fetched"] == 4
+        assert result["records_inserted"] == 4
+        assert provider.requested_cursors == [None, "cursor-2", "cursor-3"]
+        assert test_account.sync_cursor == "cursor-final"
+    
+    def test_sync_resumes_from_last_committed_page(self, db_session, test_account):
+        failing = PagedProvider(fail_on_cursor="cursor-3")
+        with patch.dict(provider_registry._providers, {"test_provider": failing}):
+            result = SyncService.sync_account(db_session, test_account.id)
+        
+        db_session.refresh(test_account)
+        assert result["status"] == "error"
+        assert test_account.sync_cursor == "cursor-3"
+        assert db_session.query(Transaction).count() == 3
+        
+        resumed = PagedProvider()
+        with patch.dict(provider_registry._providers, {"test_provider": resumed}):
+            result = SyncService.sync_account(db_session, test_account.id)
+        
+        assert result["status"] == "success"
+        assert resumed.requested_cursors == ["cursor-3"]
+        assert db_session.query(Transaction).count() == 4
+    
+    def test_async_sync_pages_from_persisted_cursor(self, db_session, test_account):
+        from app.jobs import sync_job
+        from app.tests.conftest import TestingSessionLocal
+        
+        test_account.sync_cursor = "cursor-2"
+        db_session.commit()
+        
+        provider = PagedProvider()
+        with patch.dict(provider_registry._providers, {"test_provider": provider}), \
+             patch.object(sync_job, "SessionLocal", TestingSessionLocal), \
+             patch.object(sync_job.settings, "SYNC_WORKER_MODE", "async"), \
+             patch.object(sync_job.cache, "acquire_locks", side_effect=lambda names, **kwargs: names), \
+             patch.object(sync_job.cache, "release_lock"):
+            stats = sync_job.run_sync_jobs(max_workers=1)
+        
+        db_session.refresh(test_account)
+        assert stats["records_fetched"] == 2
+        assert provider.requested_cursors == ["cursor-2", "cursor-3"]
+        assert test_account.sync_cursor == "cursor-final"
+    
+    def test_async_sync_commits_each_page_before_fetching_the_next(self, db_session, test_account):
+        from app.jobs import sync_job
+        from app.tests.conftest import TestingSessionLocal
+        
+        events = []
+        
+        class RecordingProvider(PagedProvider):
+            def fetch_transactions_page(self, token, account_id, cursor=None, since_date=None):
+                events.append(("fetch", cursor))
+                return super().fetch_transactions_page(token, account_id, cursor, since_date)
+        
+        ingest = SyncService._ingest_page
+        
+        def recording_ingest(db, account, *args):
+            result = ingest(db, account, *args)
+            events.append(("ingest", len(result[0])))
+            return result
+        
+        with patch.dict(provider_registry._providers, {"test_provider": RecordingProvider()}), \
+             patch.object(SyncService, "_ingest_page", side_effect=recording_ingest), \
+             patch.object(sync_job, "SessionLocal", TestingSessionLocal), \
+             patch.object(sync_job.settings, "SYNC_WORKER_MODE", "async"), \
+             patch.object(sync_job.cache, "acquire_locks", side_effect=lambda names, **kwargs: names), \
+             patch.object(sync_job.cache, "release_lock"):
+            stats = sync_job.run_sync_jobs(max_workers=1)
+        
+        assert stats["succeeded"] == 1
+        assert events == [
+            ("fetch", None), ("ingest", 2),
+            ("fetch", "cursor-2"), ("ingest", 1),
+            ("fetch", "cursor-3"), ("ingest", 1)
+        ]
+    
+    def test_pushed_rows_keep_cursor(self, db_session, test_account):
+        test_account.sync_cursor = "cursor-3"
+        db_session.commit()
+        
+        SyncService.sync_account(db_session, test_account.id, [{
+            "id": "PUSHED_1", "date": "2024-01-05T12:00:00", "amount": -10.0,
+            "description": "Pushed", "merchant": "Store"
+        }])
+        
+        db_session.refresh(test_account)
+        assert test_account.sync_cursor == "cursor-3"
+
 class TestSyncEndpoints:
     def test_manual_sync_trigger(self, client, auth_headers, test_account):
         response = client.post(
@@ -97,9 +311,128 @@ class TestSyncEndpoints:
         assert "logs" in data
         assert len(data["logs"]) > 0
     
+    def test_sync_stage_stats(self, client, auth_headers, test_account, db_session):
+        SyncService.sync_account(db_session, test_account.id)
+        SyncService.sync_account(db_session, test_account.id)
+        
+        response = client.get(
+            f"/sync/stats/account/{test_account.id}",
+            headers=auth_headers
+        )
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert data["runs"] == 2
+        assert data["stages"]["fetch"]["samples"] == 2
+        assert data["stages"]["fetch"]["p50"] <= data["stages"]["fetch"]["p99"]
+    
     def test_sync_unauthorized_account(self, client, auth_headers):
         response = client.post(
             "/sync/account/99999",
             headers=auth_headers
         )
         assert response.status_code == status.HTTP_404_NOT_FOUND
+
+class TestSyncJob:
+    
+    def test_run_sync_jobs_aggregates_stats(self, db_session, test_account):
+        from app.jobs import sync_job
+        from app.tests.conftest import TestingSessionLocal
+        
+        with patch.object(sync_job, "SessionLocal", TestingSessionLocal), \
+             patch.object(sync_job.cache, "acquire_locks", side_effect=lambda names, **kwargs: names), \
+             patch.object(sync_job.cache, "release_lock"):
+            stats = sync_job.run_sync_jobs(max_workers=1)
+        
+        assert stats["accounts"] == 1
+        assert stats["succeeded"] == 1
+        assert stats["records_inserted"] > 0
+        assert stats["duration_seconds"] > 0
+    
+    def test_locked_account_is_skipped(self, db_session, test_account):
+        from app.jobs import sync_job
+        from app.tests.conftest import TestingSessionLocal
+        
+        with patch.object(sync_job, "SessionLocal", TestingSessionLocal), \
+             patch.object(sync_job.cache, "acquire_locks", return_value=[]):
+            stats = sync_job.run_sync_jobs(max_workers=1)
+        
+        assert stats["skipped"] == 1
+        assert stats["succeeded"] == 0
+    
+    def test_account_locks_taken_and_released_in_one_round_trip(self, db_session, test_account):
+        from app.jobs import sync_job
+        from app.tests.conftest import TestingSessionLocal
+        
+        with patch.object(sync_job, "SessionLocal", TestingSessionLocal), \
+             patch.object(sync_job.cache, "acquire_locks", side_effect=lambda names, **kwargs: names) as acquire, \
+             patch.object(sync_job.cache, "acquire_lock") as acquire_one, \
+             patch.object(sync_job.cache, "pipeline") as pipeline:
+            sync_job.run_sync_jobs(max_workers=1)
+        
+        acquire.assert_called_once()
+        assert acquire.call_args.args[0] == [f"sync_account:{test_account.id}"]
+        acquire_one.assert_not_called()
+        pipe = pipeline.return_value.__enter__.return_value
+        pipe.delete.assert_any_call(f"lock:sync_account:{test_account.id}")
+    
+    def test_run_sync_jobs_async_mode(self, db_session, test_account):
+        from app.jobs import sync_job
+        from app.tests.conftest import TestingSessionLocal
+        
+        with patch.object(sync_job, "SessionLocal", TestingSessionLocal), \
+             patch.object(sync_job.settings, "SYNC_WORKER_MODE", "async"), \
+             patch.object(sync_job.cache, "acquire_locks", side_effect=lambda names, **kwargs: names), \
+             patch.object(sync_job.cache, "release_lock"):
+            stats = sync_job.run_sync_jobs(max_workers=1)
+        
+        assert stats["succeeded"] == 1
+        assert stats["records_fetched"] > 0
+    
+    def test_async_mode_skips_fetch_for_locked_account(self, db_session, test_account):
+        from app.jobs import sync_job
+        from app.tests.conftest import TestingSessionLocal, MockProvider
+        
+        with patch.object(sync_job, "SessionLocal", TestingSessionLocal), \
+             patch.object(sync_job.settings, "SYNC_WORKER_MODE", "async"), \
+             patch.object(sync_job.cache, "acquire_locks", return_value=[]), \
+             patch.object(sync_job.cache, "release_lock") as release, \
+             patch.object(MockProvider, "fetch_transactions") as fetch:
+            stats = sync_job.run_sync_jobs(max_workers=1)
+        
+        assert stats["skipped"] == 1
+        fetch.assert_not_called()
+        release.assert_not_called()
+
+    def test_async_timeout_keeps_lock_until_fetch_stops(self, db_session, test_account):
+        import time
+        from app.jobs import sync_job
+        from app.tests.conftest import TestingSessionLocal, MockProvider
+        
+        events = []
+        
+        def slow_fetch(*args, **kwargs):
+            time.sleep(0.3)
+            events.append("fetch finished")
+            return []
+        
+        with patch.object(sync_job, "SessionLocal", TestingSessionLocal), \
+             patch.object(sync_job.settings, "SYNC_WORKER_MODE", "async"), \
+             patch.object(sync_job.settings, "SYNC_TIMEOUT_SECONDS", 0.05), \
+             patch.object(sync_job.cache, "acquire_locks", side_effect=lambda names, **kwargs: names), \
+             patch.object(sync_job.cache, "release_lock", side_effect=lambda *a, **k: events.append("released")), \
+             patch.object(MockProvider, "fetch_transactions", side_effect=slow_fetch):
+            stats = sync_job.run_sync_jobs(max_workers=1)
+        
+        assert stats["failed"] == 1
+        assert events == ["fetch finished", "released"]
+
+def test_provider_async_adapter():
+    import asyncio
+    from app.providers.banka_provider import BankAProvider
+    
+    provider = BankAProvider()
+    accounts = asyncio.run(provider.afetch_accounts("token"))
+    transactions = asyncio.run(provider.afetch_transactions("token", "BA_CHK_001"))
+    
+    assert accounts == provider.fetch_accounts("token")
+    assert len(transactions) == 15
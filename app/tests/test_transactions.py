@@ -0,0 +1,152 @@
+import pytest
+import csv
+import io
+import json
+from unittest.mock import patch
+from datetime import datetime, timedelta, timezone
+from fastapi import status
+from app.models.transaction import Transaction
+from app.core.pagination import encode_cursor, decode_cursor
+from app.routers.transactions_router import EXPORT_FIELDS
+
+@pytest.fixture
+def ledger(db_session, test_account):
+    # Pairs of rows share a timestamp so pages must break ties on id
+    start = datetime(2024, 3, 1, 12, 0, tzinfo=timezone.utc)
+    rows = [
+        Transaction(
+            account_id=test_account.id,
+            provider_txn_id=f"PAGE_{i}",
+            date=start + timedelta(days=i // 2),
+            amount=-(10.0 + i),
+            description=f"Purchase {i}",
+            merchant="Store",
+            category="dining" if i % 3 == 0 else "shopping",
+            hash=f"page_{i}"
+        )
+        for i in range(11)
+    ]
+    db_session.add_all(rows)
+    db_session.commit()
+    return rows
+
+class TestTransactionPagination:
+    
+    def test_cursor_round_trip(self):
+        at = datetime(2024, 3, 1, 12, 0, tzinfo=timezone.utc)
+        assert decode_cursor(encode_cursor(at, 42)) == (at, 42)
+        with pytest.raises(ValueError):
+            decode_cursor("not-a-cursor")
+    
+    def test_offset_mode_unchanged(self, client, auth_headers, ledger):
+        response = client.get("/transactions/?limit=4&offset=2", headers=auth_headers)
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert isinstance(response.json(), list)
+        assert [t["provider_txn_id"] for t in response.json()] == ["PAGE_8", "PAGE_7", "PAGE_6", "PAGE_5"]
+    
+    def test_cursor_pages_cover_every_row_once(self, client, auth_headers, ledger):
+        seen, cursor = [], ""
+        while cursor is not None:
+            response = client.get(f"/transactions/?limit=4&cursor={cursor}", headers=auth_headers)
+            assert response.status_code == status.HTTP_200_OK
+            page = response.json()
+            assert len(page["items"]) <= 4
+            seen += [t["provider_txn_id"] for t in page["items"]]
+            cursor = page["next_cursor"]
+        
+        assert seen == [f"PAGE_{i}" for i in range(10, -1, -1)]
+    
+    def test_cursor_pages_stable_under_inserts(self, client, auth_headers, db_session, test_account, ledger):
+        first = client.get("/transactions/?limit=3&cursor=", headers=auth_headers).json()
+        
+        db_session.add(Transaction(
+            account_id=test_account.id,
+            provider_txn_id="PAGE_NEW",
+            date=datetime(2024, 4, 1, tzinfo=timezone.utc),
+            amount=-5.0,
+            description="Synced mid-scroll",
+            hash="page_new"
+        ))
+        db_session.commit()
+        
+        second = client.get(
+            f"/transactions/?limit=3&cursor={first['next_cursor']}", headers=auth_headers
+        ).json()
+        assert [t["provider_txn_id"] for t in second["items"]] == ["PAGE_7", "PAGE_6", "PAGE_5"]
+    
+    def test_cursor_respects_filters(self, client, auth_headers, ledger):
+        page = client.get("/transactions/?limit=2&cursor=&category=dining", headers=auth_headers).json()
+        rest = client.get(
+            f"/transactions/?limit=10&cursor={page['next_cursor']}&category=dining", headers=auth_headers
+        ).json()
+        
+        ids = [t["provider_txn_id"] for t in page["items"] + rest["items"]]
+        assert ids == ["PAGE_9", "PAGE_6", "PAGE_3", "PAGE_0"]
+        assert rest["next_cursor"] is None
+    
+    def test_invalid_cursor_rejected(self, client, auth_headers, ledger):
+        response = client.get("/transactions/?cursor=garbage", headers=auth_headers)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+    
+    def test_upgrade_schema_replaces_pagination_indexes(self):
+        from sqlalchemy import create_engine, inspect, text
+        from app.database import upgrade_schema
+        
+        legacy = create_engine("sqlite:///:memory:")
+        with legacy.begin() as conn:
+            conn.execute(text(
+                "CREATE TABLE transactions (id INTEGER PRIMARY KEY, account_id INTEGER, "
+                "date DATETIME, category VARCHAR)"
+            ))
+            conn.execute(text("CREATE INDEX idx_account_date ON transactions (account_id, date)"))
+        
+        upgrade_schema(legacy)
+        upgrade_schema(legacy)
+        
+        indexes = {index["name"] for index in inspect(legacy).get_indexes("transactions")}
+        assert {"idx_account_date_id", "idx_date_id"} <= indexes
+        assert "idx_account_date" not in indexes
+
+class TestTransactionExport:
+    
+    def test_ndjson_export_streams_every_row(self, client, auth_headers, ledger):
+        response = client.get("/transactions/export", headers=auth_headers)
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        assert [r["provider_txn_id"] for r in rows] == [f"PAGE_{i}" for i in range(10, -1, -1)]
+        assert rows[-1]["date"] == "2024-03-01T12:00:00+00:00"
+        assert rows[-1]["amount"] == -10.0
+    
+    def test_csv_export_applies_list_filters(self, client, auth_headers, ledger):
+        response = client.get(
+            "/transactions/export?format=csv&category=dining&start_date=2024-03-02T00:00:00Z",
+            headers=auth_headers
+        )
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"].startswith("text/csv")
+        assert 'filename="transactions.csv"' in response.headers["content-disposition"]
+        rows = list(csv.DictReader(io.StringIO(response.text)))
+        assert [r["provider_txn_id"] for r in rows] == ["PAGE_9", "PAGE_6", "PAGE_3"]
+    
+    def test_export_yields_one_chunk_per_batch(self, db_session, ledger):
+        from sqlalchemy import select
+        from app.routers.transactions_router import EXPORT_COLUMNS, _export_chunks
+        
+        stmt = select(*EXPORT_COLUMNS).order_by(Transaction.id)
+        with patch("app.routers.transactions_router.settings.EXPORT_BATCH_SIZE", 4):
+            chunks = list(_export_chunks(db_session, stmt, "csv"))
+        
+        assert [len(chunk.splitlines()) for chunk in chunks] == [5, 4, 3]
+    
+    def test_empty_csv_export_has_header(self, client, auth_headers):
+        response = client.get("/transactions/export?format=csv", headers=auth_headers)
+        
+        assert response.text.splitlines() == [",".join(EXPORT_FIELDS)]
+    
+    def test_unknown_format_rejected(self, client, auth_headers):
+        response = client.get("/transactions/export?format=xml", headers=auth_headers)
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
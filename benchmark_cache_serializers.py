@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Compare cache serializers on realistic account and transaction list payloads
+Usage: python benchmark_cache_serializers.py [--transactions 500] [--rounds 200]
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+from app.core.serializers import Serializer, FORMATS, COMPRESSIONS
+from app.generator.transaction_generator import TransactionGenerator
+
+def build_accounts(count: int = 6) -> list:
+    now = datetime.now(timezone.utc)
+    return [
+        {
+            "id": i,
+            "name": f"Checking {i}",
+            "account_type": "checking" if i % 2 else "savings",
+            "balance": round(1000 + i * 137.25, 2),
+            "currency": "USD",
+            "provider_id": ("banka", "bankb", "bankc")[i % 3],
+            "last_synced": now - timedelta(minutes=i * 7),
+            "is_active": True,
+            "created_at": now - timedelta(days=90 + i)
+        }
+        for i in range(1, count + 1)
+    ]
+
+def build_transactions(count: int) -> list:
+    days = max(30, count // 4)
+    start = datetime.now(timezone.utc) - timedelta(days=days)
+    raw = TransactionGenerator.generate_transactions("acct_1", start, days=days, daily_count=8)
+    while len(raw) < count:
+        raw += raw
+    return [
+        {
+            "id": i,
+            "account_id": 1,
+            "provider_txn_id": txn["id"],
+            "date": txn["date"],
+            "amount": txn["amount"],
+            "description": txn["description"],
+            "merchant": txn["merchant"],
+            "category": txn["category"],
+            "status": txn["status"],
+            "is_duplicate": False,
+            "is_anomaly": False,
+            "created_at": start + timedelta(minutes=i)
+        }
+        for i, txn in enumerate(raw[:count], start=1)
+    ]
+
+def measure(serializer: Serializer, payload, rounds: int) -> tuple:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        data = serializer.dumps(payload)
+    encoded = time.perf_counter()
+    for _ in range(rounds):
+        Serializer.loads(data)
+    decoded = time.perf_counter()
+    return len(data), (encoded - started) / rounds * 1e6, (decoded - encoded) / rounds * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--transactions", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--compress-min-bytes", type=int, default=1024)
+    args = parser.parse_args()
+
+    payloads = {
+        "accounts": build_accounts(),
+        f"transactions[{args.transactions}]": build_transactions(args.transactions)
+    }
+
+    print(f"{'payload':<20} {'serializer':<16} {'bytes':>9} {'ratio':>7} {'encode µs':>11} {'decode µs':>11}")
+    for name, payload in payloads.items():
+        baseline = None
+        for fmt, (_, _, _, fmt_available) in FORMATS.items():
+            for compression, (_, _, _, comp_available) in COMPRESSIONS.items():
+                if not (fmt_available and comp_available):
+                    print(f"{name:<20} {fmt + '+' + compression:<16} {'not installed':>9}")
+                    continue
+                serializer = Serializer(fmt, compression, args.compress_min_bytes)
+                size, encode_us, decode_us = measure(serializer, payload, args.rounds)
+                baseline = baseline or size
+                print(
+                    f"{name:<20} {fmt + '+' + compression:<16} {size:>9} "
+                    f"{size / baseline:>7.2f} {encode_us:>11.1f} {decode_us:>11.1f}"
+                )
+        print()
+
+if __name__ == "__main__":
+    main()